@@ -98,12 +98,12 @@ class Aligner():
 
         if (ec1 < ec2):
             selection = np.array([y for x, y, z in pairs])
-            indAdj = bio_net.org2.adjacency[selection[:, None], selection]
+            indAdj = bio_net.org2.sub_adjacency(selection)
         else:
             selection = np.array([x for x, y, z in pairs])
-            indAdj = bio_net.org1.adjacency[selection[:, None], selection]
+            indAdj = bio_net.org1.sub_adjacency(selection)
 
-        mind = sum(sum(indAdj))
+        mind = indAdj.sum()
         ICS = medg / mind
         S3 = medg / (mec + mind - medg)
 
@@ -117,17 +117,10 @@ class Aligner():
 
         try:
             # calculation GOC score
-            GO_scores = string_db.extract_all_organism_GO('4932+7227+9606.out')
-            GOC = 0
-            for pair in pairs:
-                prot_id1 = bio_net.org1.id_to_node[pair[0]]
-                prot_id2 = bio_net.org2.id_to_node[pair[1]]
-                terms1 = set(GO_scores.get(prot_id1, []))
-                terms2 = set(GO_scores.get(prot_id2, []))
-                union_terms = terms1.union(terms2)
-                intersection_terms = terms1.intersection(terms2)
-                if len(union_terms) > 0:
-                    GOC += (len(intersection_terms) / len(union_terms))
+            GO_store = string_db.extract_all_organism_GO('4932+7227+9606.out')
+            prot_ids1 = [bio_net.org1.id_to_node[x] for x, y, z in pairs]
+            prot_ids2 = [bio_net.org2.id_to_node[y] for x, y, z in pairs]
+            GOC = GO_store.jaccard(prot_ids1, prot_ids2).sum()
             size = min(bio_net.org1.node_count, bio_net.org2.node_count)
             self.GOC = GOC / size
             self.measures['GOC'] = self.GOC
@@ -137,67 +130,37 @@ class Aligner():
 
         try:
             # pathway score calculation:
-            PW_score = 0
-            PW_count = 0
-            matching = {}
-            for pair in pairs:
-                matching[bio_net.org1.id_to_node[pair[0]]
-                         ] = bio_net.org2.id_to_node[pair[1]]
-
             pw1 = interface.get_pathways(bio_net.org1.org_id)
-            pathways1 = set(pw1.keys())
             pw2 = interface.get_pathways(bio_net.org2.org_id)
-            pathways2 = set(pw2.keys())
-
-            pathways = list(pathways1.intersection(pathways2))
-
-            for pathway in pathways:
-                # print('pathway id: {}'.format(pathway))
-                prots1 = set(pw1[pathway])
-                # print('prots1: {}'.format(prots1))
-                prots2 = set(pw2[pathway])
-                # print('prots2: {}'.format(prots2))
-                prots1to2 = set([matching[x]
-                                 for x in prots1 if x in matching.keys()])
-                # print('prots1to2: {}'.format(prots1to2))
-                kept = prots1to2.intersection(prots2)
-                # PW_score += len(kept) / min(len(prots1), len(prots2))
-                PW_score += len(kept)
-                # if PW_count>0 and (len(kept) / min(len(prots1), len(prots2)) > 0.7):
-                #     print('pathway id: {}, \tscore: {},\tsize: {},{},{}'.format(pathway, len(kept) / min(len(prots1), len(prots2)),len(prots1), len(prots2), len(kept)))
-                # PW_count += 1
-                PW_count += min(len(prots1), len(prots2))
-            self.PWS1 = PW_score / PW_count
-            self.measures['PWS1'] = self.PWS1
-            # self.PWS = PW_score / len(pathways)
+            pathways = np.intersect1d(pw1.keys, pw2.keys)
 
-            # pathway score 2 calculation:
-            PW_score = 0
-            PW_count = 0
-            matching = {}
+            # org1 node -> aligned org2 node
+            matching = np.full(bio_net.org1.node_count, -1, dtype=np.int64)
             for pair in pairs:
-                matching[bio_net.org1.id_to_node[pair[0]]
-                         ] = bio_net.org2.id_to_node[pair[1]]
+                matching[pair[0]] = pair[1]
+
+            pos1, nodes1 = interface.pathway_nodes(pw1, pathways, bio_net.org1)
+            pos2, nodes2 = interface.pathway_nodes(pw2, pathways, bio_net.org2)
+            nodes1to2 = np.where(nodes1 >= 0, matching[nodes1], -1)
+
+            # (pathway, org2 node) codes of mapped and native members
+            base = bio_net.org2.node_count
+            codes1 = np.unique(pos1[nodes1to2 >= 0] * base +
+                               nodes1to2[nodes1to2 >= 0])
+            codes2 = np.unique(pos2[nodes2 >= 0] * base + nodes2[nodes2 >= 0])
+            kept = np.bincount(
+                np.intersect1d(codes1, codes2, assume_unique=True) // base,
+                minlength=len(pathways))
+            sizes = np.minimum(pw1.row_sizes(pw1.key_ids(pathways)),
+                               pw2.row_sizes(pw2.key_ids(pathways)))
+
+            self.PWS1 = int(kept.sum()) / int(sizes.sum())
+            self.measures['PWS1'] = self.PWS1
 
-            pw1 = interface.get_pathways(bio_net.org1.org_id)
-            pathways1 = set(pw1.keys())
-            pw2 = interface.get_pathways(bio_net.org2.org_id)
-            pathways2 = set(pw2.keys())
-
-            pathways = list(pathways1.intersection(pathways2))
-
-            for pathway in pathways:
-                prots1 = set(pw1[pathway])
-                prots2 = set(pw2[pathway])
-                prots1to2 = set([matching[x]
-                                 for x in prots1 if x in matching.keys()])
-                kept = prots1to2.intersection(prots2)
-                if min(len(prots1), len(prots2)) >= cs.PWS2_LIMIT:
-                    PW_score += len(kept)
-                    PW_count += min(len(prots1), len(prots2))
-            self.PWS2 = PW_score / PW_count
+            # pathway score 2 calculation:
+            large = sizes >= cs.PWS2_LIMIT
+            self.PWS2 = int(kept[large].sum()) / int(sizes[large].sum())
             self.measures['PWS2'] = self.PWS2
-            # self.PWS = PW_score / len(pathways)
         except Exception as e:
             message = 'skipping PWS calculation, PW info not available!'
             utils.print_log(message)
@@ -354,23 +317,13 @@ class Aligner():
             paired2.add(pair[1])
         remains1 = [x for x in range(
             bio_net.org1.node_count) if x not in paired1]
-        reverse1 = {x: i for i, x in enumerate(remains1)}
-        remainset1 = set(remains1)
         remains2 = [x for x in range(
             bio_net.org2.node_count) if x not in paired2]
-        reverse2 = {x: i for i, x in enumerate(remains2)}
-        remainset2 = set(remains2)
-
-        remain_sim = np.zeros((len(remains1), len(remains2)))
 
-        for pair in pairs:
-            nodes1 = [x for x in bio_net.org1.neighbors(
-                pair[0]) if x in remainset1]
-            nodes2 = [x for x in bio_net.org2.neighbors(
-                pair[1]) if x in remainset2]
-            for n1 in nodes1:
-                for n2 in nodes2:
-                    remain_sim[reverse1[n1]][reverse2[n2]] += 1
+        # pairs whose nodes neighbor both remaining nodes
+        remain_sim = (bio_net.org1.sub_adjacency(
+            remains1, [x[0] for x in pairs]) @ bio_net.org2.sub_adjacency(
+            [x[1] for x in pairs], remains2)).toarray()
 
         # now connect remains
         rp1, rp2 = optimize.linear_sum_assignment(-remain_sim)
@@ -535,8 +488,8 @@ class Aligner():
         #initialization
         assignment_file_path = os.path.join(cs.JSON_PATH,
                                             '{}_assignment'.format(self.seed_alg))
-        node_idx1 = bio_net.org1.degree.argsort()
-        node_idx2 = bio_net.org2.degree.argsort()
+        node_idx1 = bio_net.org1.degree_order()
+        node_idx2 = bio_net.org2.degree_order()
 
         pairs ,algn_infos = [], []
         round_select1, round_select2 = [], []
@@ -548,21 +501,16 @@ class Aligner():
         net_pure_sim = bio_net.blast_sim.reshape(sim_dim)
 
         # organism graphs
-        G1 = nx.Graph()
-        G1.add_nodes_from(range(bio_net.org1.node_count))
-        G1.add_edges_from(bio_net.org1.edges)
-
-        G2 = nx.Graph()
-        G2.add_nodes_from(range(bio_net.org2.node_count))
-        G2.add_edges_from(bio_net.org2.edges)
+        G1 = bio_net.org1.graph()
+        G2 = bio_net.org2.graph()
 
         if self.seed_alg == 'blast+cut_coeff+betweenness_centrality':
             bc_file_name1 = ('mss={}-{}.bc'.format(cs.MAX_SEED_SIZE, bio_net.org1.org_id))
             bc_file_name2 = ('mss={}-{}.bc'.format(cs.MAX_SEED_SIZE, bio_net.org2.org_id))
 
             if not utils.files_exist([bc_file_name1, bc_file_name2], assignment_file_path):
-                BC1 = nx.betweenness_centrality(G1)
-                BC2 = nx.betweenness_centrality(G2)
+                BC1 = bio_net.org1.betweenness()
+                BC2 = bio_net.org2.betweenness()
 
                 with open(utils.join_path(assignment_file_path, bc_file_name1), 'wb') as fp:
                     pickle.dump(BC1, fp)
@@ -709,19 +657,19 @@ class Aligner():
 
             if x in org1_mapping:
                 xx = org1_mapping[x]
-                for n1 in bio_net.org1.neighbors(x):
-                    if n1 in org1_mapping:
-                        n2 = org1_mapping[n1]
-                        if n2 in bio_net.org2.neighbors(xx):
-                            CE_x += 1
+                mapped = [org1_mapping[n1]
+                          for n1 in bio_net.org1.neighbors(x).tolist()
+                          if n1 in org1_mapping]
+                CE_x = int(np.isin(mapped,
+                                   bio_net.org2.neighbors(xx)).sum())
 
             if y in org1_mapping:
                 yy = org1_mapping[y]
-                for n1 in bio_net.org1.neighbors(y):
-                    if n1 in org1_mapping:
-                        n2 = org1_mapping[n1]
-                        if n2 in bio_net.org2.neighbors(yy):
-                            CE_y += 1
+                mapped = [org1_mapping[n1]
+                          for n1 in bio_net.org1.neighbors(y).tolist()
+                          if n1 in org1_mapping]
+                CE_y = int(np.isin(mapped,
+                                   bio_net.org2.neighbors(yy)).sum())
 
             x_data.append(CE_x)
             x_data.append(BC1[x])
@@ -764,19 +712,19 @@ class Aligner():
 
             if x in org2_mapping:
                 xx = org2_mapping[x]
-                for n1 in bio_net.org2.neighbors(x):
-                    if n1 in org2_mapping:
-                        n2 = org2_mapping[n1]
-                        if n2 in bio_net.org1.neighbors(xx):
-                            CE_x += 1
+                mapped = [org2_mapping[n1]
+                          for n1 in bio_net.org2.neighbors(x).tolist()
+                          if n1 in org2_mapping]
+                CE_x = int(np.isin(mapped,
+                                   bio_net.org1.neighbors(xx)).sum())
 
             if y in org2_mapping:
                 yy = org2_mapping[y]
-                for n1 in bio_net.org2.neighbors(y):
-                    if n1 in org2_mapping:
-                        n2 = org2_mapping[n1]
-                        if n2 in bio_net.org1.neighbors(yy):
-                            CE_y += 1
+                mapped = [org2_mapping[n1]
+                          for n1 in bio_net.org2.neighbors(y).tolist()
+                          if n1 in org2_mapping]
+                CE_y = int(np.isin(mapped,
+                                   bio_net.org1.neighbors(yy)).sum())
 
             x_data.append(CE_x)
             x_data.append(BC1[x])
@@ -796,16 +744,14 @@ class Aligner():
         return((S1new, S2new))
 
     def extend(self, seed_pairs, node_paired1, node_paired2, bio_net):
-        node_idx1 = bio_net.org1.degree.argsort()
-        node_idx2 = bio_net.org2.degree.argsort()
+        node_idx1 = bio_net.org1.degree_order()
+        node_idx2 = bio_net.org2.degree_order()
 
         pairs = seed_pairs.copy()
-        reached_neighs1 = set.union(
-            *[set(bio_net.org1.neighbors(x[0])) for x in pairs])
+        reached_neighs1 = bio_net.org1.neighbor_set([x[0] for x in pairs])
         remains1 = [x for x in node_idx1 if not node_paired1[x]]
 
-        reached_neighs2 = set.union(
-            *[set(bio_net.org2.neighbors(x[1])) for x in pairs])
+        reached_neighs2 = bio_net.org2.neighbor_set([x[1] for x in pairs])
         remains2 = [x for x in node_idx2 if not node_paired2[x]]
 
         paired1 = set([x[0] for x in pairs])
@@ -818,8 +764,8 @@ class Aligner():
 
         # generate seed scores
         for seed_pair in pairs:
-            for i1 in bio_net.org1.neighbors(seed_pair[0]):
-                for i2 in bio_net.org2.neighbors(seed_pair[1]):
+            for i1 in bio_net.org1.neighbors(seed_pair[0]).tolist():
+                for i2 in bio_net.org2.neighbors(seed_pair[1]).tolist():
                     # if not already aligned
                     if not(node_paired1[i1] or node_paired2[i2]):
                         if self.extend_sim_method == 'common_neighbor':
@@ -988,25 +934,16 @@ class Aligner():
             os.makedirs(assignment_file_path)
 
         if self.cut_coef == 'degree':
-            node_idx1 = bio_net.org1.degree.argsort()
-            node_idx2 = bio_net.org2.degree.argsort()
+            node_idx1 = bio_net.org1.degree_order()
+            node_idx2 = bio_net.org2.degree_order()
         elif self.cut_coef == 'neighbor-degree':
-            node_score1 = [0] * bio_net.org1.node_count
-            for i in range(len(node_score1)):
-                node_score1[i] = (cs.NEIGHBOR_STRENGTH *
-                                  sum([bio_net.org1.degree[x]
-                                       for x in bio_net.org1.neighbors(i)]))
-            node_score1 = [sum(x)
-                           for x in zip(node_score1, bio_net.org1.degree)]
-            node_idx1 = np.array(node_score1).argsort()
-            node_score2 = [0] * bio_net.org2.node_count
-            for i in range(len(node_score2)):
-                node_score2[i] = (cs.NEIGHBOR_STRENGTH *
-                                  sum([bio_net.org2.degree[x]
-                                       for x in bio_net.org2.neighbors(i)]))
-            node_score2 = [sum(x)
-                           for x in zip(node_score2, bio_net.org2.degree)]
-            node_idx2 = np.array(node_score2).argsort()
+            # own degree plus the weighted degree sum of the neighbors
+            node_score1 = bio_net.org1.degree + cs.NEIGHBOR_STRENGTH * (
+                bio_net.org1.adjacency @ bio_net.org1.degree)
+            node_idx1 = node_score1.argsort()
+            node_score2 = bio_net.org2.degree + cs.NEIGHBOR_STRENGTH * (
+                bio_net.org2.adjacency @ bio_net.org2.degree)
+            node_idx2 = node_score2.argsort()
 
         node_selected1 = {i: False for i in node_idx1}
         node_paired1 = {i: False for i in node_idx1}
@@ -1045,13 +982,8 @@ class Aligner():
         net_sim = bio_net.similarity.reshape(sim_dim)
         net_pure_sim = bio_net.blast_sim.reshape(sim_dim)
 
-        G1 = nx.Graph()
-        G1.add_nodes_from(range(bio_net.org1.node_count))
-        G1.add_edges_from(bio_net.org1.edges)
-
-        G2 = nx.Graph()
-        G2.add_nodes_from(range(bio_net.org2.node_count))
-        G2.add_edges_from(bio_net.org2.edges)
+        G1 = bio_net.org1.graph()
+        G2 = bio_net.org2.graph()
 
         if self.seed_alg == 'blast':
             # greedy algorithm
@@ -1302,8 +1234,8 @@ class Aligner():
                 bc_file_name2 = ('mss={}-{}.bc'.format(cs.MAX_SEED_SIZE, bio_net.org2.org_id))
 
                 if not utils.files_exist([bc_file_name1, bc_file_name2], assignment_file_path):
-                    BC1 = nx.betweenness_centrality(G1)
-                    BC2 = nx.betweenness_centrality(G2)
+                    BC1 = bio_net.org1.betweenness()
+                    BC2 = bio_net.org2.betweenness()
 
                     with open(utils.join_path(assignment_file_path, bc_file_name1), 'wb') as fp:
                         pickle.dump(BC1, fp)
@@ -1474,12 +1406,10 @@ class Aligner():
             algn_info = {}
 
         pairs += new_pairs
-        reached_neighs1 = set.union(
-            *[set(bio_net.org1.neighbors(x[0])) for x in pairs])
+        reached_neighs1 = bio_net.org1.neighbor_set([x[0] for x in pairs])
         remains1 = [x for x in node_idx1 if not node_paired1[x]]
         # paired_nodes1 = set([x[0] for x in pairs])
-        reached_neighs2 = set.union(
-            *[set(bio_net.org2.neighbors(x[1])) for x in pairs])
+        reached_neighs2 = bio_net.org2.neighbor_set([x[1] for x in pairs])
         remains2 = [x for x in node_idx2 if not node_paired2[x]]
         # paired_nodes2 = set([x[1] for x in pairs])
 
@@ -1494,10 +1424,8 @@ class Aligner():
             while not finished:
                 # extend to new pairs
                 round_select1 = []
-                round_reverse1 = {}
                 for i in reversed(remains1):
                     if i in reached_neighs1:
-                        round_reverse1[i] = len(round_select1)
                         round_select1.append(i)
                         node_selected1[i] = True
                     if len(round_select1) >= cs.MAX_EXTEND_SIZE:
@@ -1512,10 +1440,8 @@ class Aligner():
                 algn_info['s1'] = round_select1
 
                 round_select2 = []
-                round_reverse2 = {}
                 for i in reversed(remains2):
                     if i in reached_neighs2:
-                        round_reverse2[i] = len(round_select2)
                         round_select2.append(i)
                         node_selected2[i] = True
                     if len(round_select2) >= cs.MAX_EXTEND_SIZE:
@@ -1534,36 +1460,37 @@ class Aligner():
                                    np.array(round_select2)]
                 base_sim = utils.normalize(base_sim)
 
-                # new similarity based on pairs
-                topo_sim = np.zeros((len(round_select1), len(round_select2)))
-                for pair in pairs:
-                    nodes1 = [x for x in bio_net.org1.neighbors(
-                        pair[0]) if x in round_select1]
-                    nodes2 = [x for x in bio_net.org2.neighbors(
-                        pair[1]) if x in round_select2]
-                    for n1 in nodes1:
-                        for n2 in nodes2:
-                            topo_sim[round_reverse1[n1]
-                                     ][round_reverse2[n2]] += 1
-                            if self.method == "seedexcost":
-                                topo_sim[round_reverse1[n1]
-                                         ][round_reverse2[n2]
-                                           ] += 2 * cs.BAD_EDGE_COST
+                # new similarity based on pairs, pairs whose nodes neighbor
+                # both selected nodes
+                pair_weight = 1
+                if self.method == "seedexcost":
+                    pair_weight += 2 * cs.BAD_EDGE_COST
+                topo_sim = pair_weight * (bio_net.org1.sub_adjacency(
+                    round_select1, [x[0] for x in pairs]) @
+                    bio_net.org2.sub_adjacency(
+                    [x[1] for x in pairs], round_select2)).toarray()
 
                 if self.method == "seedexcost":
-                    cost_vec1 = np.array(
-                        [len([x for x in bio_net.org1.neighbors(y)
-                              if x in paired1])
-                         for y in round_select1])
+                    # number of paired neighbors of every selected node
+                    paired_mask1 = np.zeros(bio_net.org1.node_count)
+                    paired_mask1[list(paired1)] = 1
+                    positions, nodes = bio_net.org1.neighbors_many(
+                        round_select1)
+                    cost_vec1 = np.bincount(
+                        positions, weights=paired_mask1[nodes],
+                        minlength=len(round_select1))
                     cost_sim1 = cs.BAD_EDGE_COST * cost_vec1.reshape(
                         len(round_select1), 1).repeat(
                         len(round_select2), axis=1)
                     topo_sim -= cost_sim1
 
-                    cost_vec2 = np.array(
-                        [len([x for x in bio_net.org2.neighbors(y)
-                              if x in paired2])
-                         for y in round_select2])
+                    paired_mask2 = np.zeros(bio_net.org2.node_count)
+                    paired_mask2[list(paired2)] = 1
+                    positions, nodes = bio_net.org2.neighbors_many(
+                        round_select2)
+                    cost_vec2 = np.bincount(
+                        positions, weights=paired_mask2[nodes],
+                        minlength=len(round_select2))
                     cost_sim2 = cs.BAD_EDGE_COST * cost_vec2.reshape(
                         1, len(round_select2)).repeat(
                         len(round_select1), axis=0)
@@ -1585,9 +1512,9 @@ class Aligner():
                 new_pairs = []
                 for i in range(len(pl1)):
                     n1 = round_select1[int(pl1[i])]
-                    reached_neighs1.update(bio_net.org1.neighbors(n1))
+                    reached_neighs1.update(bio_net.org1.neighbors(n1).tolist())
                     n2 = round_select2[int(pl2[i])]
-                    reached_neighs2.update(bio_net.org2.neighbors(n2))
+                    reached_neighs2.update(bio_net.org2.neighbors(n2).tolist())
                     new_pairs.append(
                         (n1, n2, bio_net.similarity[bio_net.v_ind(n1, n2)]))
                     node_paired1[n1] = True
@@ -1626,8 +1553,8 @@ class Aligner():
 
             # generate seed scores
             for seed_pair in pairs:
-                for i1 in bio_net.org1.neighbors(seed_pair[0]):
-                    for i2 in bio_net.org2.neighbors(seed_pair[1]):
+                for i1 in bio_net.org1.neighbors(seed_pair[0]).tolist():
+                    for i2 in bio_net.org2.neighbors(seed_pair[1]).tolist():
                         # if not already aligned
                         if not(node_paired1[i1] or node_paired2[i2]):
                             if self.extend_sim_method == 'common_neighbor':
@@ -1754,8 +1681,9 @@ class Aligner():
                     node_paired2[next_pair[1]] = True
 
                     # update data structures
-                    for i1 in bio_net.org1.neighbors(next_pair[0]):
-                        for i2 in bio_net.org2.neighbors(next_pair[1]):
+                    for i1 in bio_net.org1.neighbors(next_pair[0]).tolist():
+                        for i2 in bio_net.org2.neighbors(
+                                next_pair[1]).tolist():
                             old_score = scores_dict.get((i1, i2), 0)
                             # update old score
                             old_record = scores_record_dict.get(old_score, [])
@@ -1870,41 +1798,33 @@ class Aligner():
             csv_info.append(len(roundpairs))
 
             sel1 = [x[0] for x in roundpairs]
-            adj1 = bio_net.org1.adjacency[
-                np.array(sel1)[:, None],
-                np.array(sel1)]
-            csv_info.append(sum(sum(adj1)) / 2)
+            adj1 = bio_net.org1.sub_adjacency(sel1)
+            csv_info.append(adj1.sum() / 2)
 
             sel2 = [x[1] for x in roundpairs]
-            adj2 = bio_net.org2.adjacency[
-                np.array(sel2)[:, None],
-                np.array(sel2)]
-            csv_info.append(sum(sum(adj2)) / 2)
+            adj2 = bio_net.org2.sub_adjacency(sel2)
+            csv_info.append(adj2.sum() / 2)
 
-            adjcomb = np.multiply(adj1, adj2)
-            csv_info.append(sum(sum(adjcomb)) / 2)
+            adjcomb = adj1.multiply(adj2)
+            csv_info.append(adjcomb.sum() / 2)
 
             if (index > 0):
-                round_adj1 = bio_net.org1.adjacency[
-                    np.array(prev1)[:, None],
-                    np.array(sel1)]
-                csv_info.append(sum(sum(round_adj1)))
+                round_adj1 = bio_net.org1.sub_adjacency(prev1, sel1)
+                csv_info.append(round_adj1.sum())
             else:
                 csv_info.append(0)
             prev1 += sel1
 
             if (index > 0):
-                round_adj2 = bio_net.org2.adjacency[
-                    np.array(prev2)[:, None],
-                    np.array(sel2)]
-                csv_info.append(sum(sum(round_adj2)))
+                round_adj2 = bio_net.org2.sub_adjacency(prev2, sel2)
+                csv_info.append(round_adj2.sum())
             else:
                 csv_info.append(0)
             prev2 += sel2
 
             if (index > 0):
-                round_adjcomb = np.multiply(round_adj1, round_adj2)
-                csv_info.append(sum(sum(round_adjcomb)))
+                round_adjcomb = round_adj1.multiply(round_adj2)
+                csv_info.append(round_adjcomb.sum())
             else:
                 csv_info.append(0)
 
@@ -1937,16 +1857,17 @@ class Aligner():
         m = bio_net.org1.node_count
         n = bio_net.org2.node_count
 
-        alignment_adjacency = np.zeros((m, n))
-        for pair in pairs:
-            n1, n2, s = pair
-            alignment_adjacency[n1][n2] = 1
+        # sparse alignment matrix, repeated pairs count once
+        alignment_adjacency = sparse.csr_matrix(
+            (np.ones(len(pairs)), ([x[0] for x in pairs],
+                                   [x[1] for x in pairs])), shape=(m, n))
+        alignment_adjacency.data[:] = 1
 
-        mat1 = np.dot(alignment_adjacency, bio_net.org2.adjacency)
-        mat2 = np.dot(mat1, alignment_adjacency.transpose())
-        mat3 = np.subtract(bio_net.org1.adjacency, mat2)
+        mat1 = alignment_adjacency @ bio_net.org2.adjacency
+        mat2 = mat1 @ alignment_adjacency.transpose()
+        mat3 = bio_net.org1.adjacency - mat2
 
-        self.frobenius = np.linalg.norm(mat3, 'fro')
+        self.frobenius = slnlg.norm(mat3, 'fro')
         return self.frobenius
 
     def align(self, bio_net, check=True, file_path=cs.JSON_PATH):
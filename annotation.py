@@ -0,0 +1,138 @@
+"""
+this module contains AnnotationStore class that keeps protein annotations
+(such as GO terms) as integer coded terms in a CSR layout. the store lives
+in a directory of numpy arrays that is memory mapped when loaded
+"""
+
+import numpy as np
+
+import utils
+
+
+class AnnotationStore():
+    """docstring for AnnotationStore"""
+
+    def __init__(self, store_path, mmap_mode='r'):
+        self.store_path = store_path
+        arrays = utils.load_arrays(store_path, mmap_mode=mmap_mode)
+
+        # sorted protein ids and interned term table
+        self.keys = arrays.pop('keys')
+        self.terms = arrays.pop('terms')
+
+        # terms of keys[i] are terms[indices[indptr[i]:indptr[i + 1]]]
+        self.indptr = arrays.pop('indptr')
+        self.indices = arrays.pop('indices')
+
+        # per annotation columns aligned with indices (e.g. evidence)
+        self.columns = arrays
+
+    # build and write a store from parallel key and term sequences
+    @staticmethod
+    def build(store_path, keys, terms, unique=False, **columns):
+        keys = np.array(keys, dtype=str)
+        terms = np.array(terms, dtype=str)
+        key_table, key_ids = np.unique(keys, return_inverse=True)
+        term_table, term_ids = np.unique(terms, return_inverse=True)
+
+        # group by key, annotations of a key keep their input order
+        order = np.argsort(key_ids, kind='stable')
+        if unique:
+            codes = key_ids[order].astype(np.int64) * len(term_table)
+            codes += term_ids[order]
+            order = order[np.sort(np.unique(codes, return_index=True)[1])]
+
+        counts = np.bincount(key_ids[order], minlength=len(key_table))
+        indptr = np.zeros(len(key_table) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+
+        columns = {name: np.array(column, dtype=str)[order]
+                   for name, column in columns.items()}
+        utils.write_arrays(store_path, keys=key_table, terms=term_table,
+                           indptr=indptr,
+                           indices=term_ids[order].astype(np.int32),
+                           **columns)
+
+        return AnnotationStore(store_path)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return self.key_ids([key])[0] >= 0
+
+    # row of each key in the store, -1 for keys without annotation
+    def key_ids(self, keys):
+        keys = np.array(keys, dtype=str)
+        if len(self.keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        rows = np.searchsorted(self.keys, keys)
+        rows[rows == len(self.keys)] = 0
+        return np.where(self.keys[rows] == keys, rows, -1)
+
+    # interned term ids of a key
+    def term_ids(self, key):
+        row = self.key_ids([key])[0]
+        if row < 0:
+            return np.zeros(0, dtype=np.int32)
+        return np.asarray(self.indices[self.indptr[row]:self.indptr[row + 1]])
+
+    # dict like access to the terms of a key
+    def get(self, key, default=None):
+        row = self.key_ids([key])[0]
+        if row < 0:
+            return default
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.terms[self.indices[start:end]].tolist()
+
+    # annotations of a key with their extra columns, e.g. (go, evidence, score)
+    def annotations(self, key, columns=()):
+        row = self.key_ids([key])[0]
+        if row < 0:
+            return []
+        start, end = self.indptr[row], self.indptr[row + 1]
+        fields = [self.terms[self.indices[start:end]]]
+        fields += [self.columns[name][start:end] for name in columns]
+        return list(zip(*[x.tolist() for x in fields]))
+
+    # jaccard similarity of term sets for each pair of keys1[i], keys2[i]
+    def jaccard(self, keys1, keys2):
+        codes1, counts1 = self._pair_codes(self.key_ids(keys1))
+        codes2, counts2 = self._pair_codes(self.key_ids(keys2))
+        size = len(counts1)
+
+        both = np.intersect1d(codes1, codes2, assume_unique=True)
+        inter = np.bincount(both // self._code_base(), minlength=size)
+        union = counts1 + counts2 - inter
+
+        scores = np.zeros(size)
+        mask = union > 0
+        scores[mask] = inter[mask] / union[mask]
+        return scores
+
+    # number of annotations in each row, 0 for missing rows (-1)
+    def row_sizes(self, rows):
+        starts = np.where(rows >= 0, self.indptr[rows], 0)
+        return np.where(rows >= 0, self.indptr[rows + 1] - starts, 0)
+
+    # (position in rows, term id) of every annotation of the given rows
+    def expand(self, rows):
+        starts = np.where(rows >= 0, self.indptr[rows], 0)
+        counts = self.row_sizes(rows)
+
+        positions = np.repeat(np.arange(len(rows)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts)
+        terms = np.asarray(self.indices)[np.repeat(starts, counts) + offsets]
+        return positions, terms
+
+    # unique (pair, term) codes of rows and their term counts per pair
+    def _pair_codes(self, rows):
+        positions, terms = self.expand(rows)
+        codes = np.unique(positions.astype(np.int64) * self._code_base() +
+                          terms)
+        return codes, np.bincount(codes // self._code_base(),
+                                  minlength=len(rows))
+
+    def _code_base(self):
+        return max(len(self.terms), 1)
@@ -0,0 +1,109 @@
+"""
+this module contains BlastHits class, a columnar table of blastp hits.
+every (query, subject) hit is stored once with its bitscore, e-value and
+identity so all consumers read the same parsed arrays instead of the raw
+blast output
+"""
+
+import numpy as np
+
+import utils
+import constants as cs
+
+
+class BlastHits():
+    """docstring for BlastHits"""
+
+    def __init__(self, store_path, mmap_mode='r'):
+        self.store_path = store_path
+        arrays = utils.load_arrays(store_path, mmap_mode=mmap_mode)
+
+        # protein name tables of query and subject indices
+        self.queries = arrays['queries']
+        self.subjects = arrays['subjects']
+
+        # one row per hit
+        self.query = arrays['query']
+        self.subject = arrays['subject']
+        self.bitscore = arrays['bitscore']
+        self.evalue = arrays['evalue']
+        self.identity = arrays['identity']
+
+        # searched proteins, sequence hashes and subject db size, for
+        # incremental searches
+        self.searched = {x: arrays[x] for x in
+                         ['query_names', 'query_hashes',
+                          'subject_names', 'subject_hashes',
+                          'subject_dbsize'] if x in arrays}
+
+        # e-value the hits were searched with, no hit is above it
+        self.search_evalue = cs.BLAST_LEGACY_EVALUE
+        if 'search_evalue' in arrays:
+            self.search_evalue = float(arrays['search_evalue'])
+
+    # build and write a hit table from parallel per hit sequences
+    @staticmethod
+    def build(store_path, queries, subjects, bitscores, evalues, identities,
+              search_evalue=cs.BLAST_LEGACY_EVALUE, **searched):
+        query_table, query = np.unique(np.array(queries, dtype=str),
+                                       return_inverse=True)
+        subject_table, subject = np.unique(np.array(subjects, dtype=str),
+                                           return_inverse=True)
+
+        utils.write_arrays(store_path, queries=query_table,
+                           subjects=subject_table,
+                           query=query.astype(np.int32),
+                           subject=subject.astype(np.int32),
+                           bitscore=np.array(bitscores, dtype=np.float64),
+                           evalue=np.array(evalues, dtype=np.float64),
+                           identity=np.array(identities, dtype=np.float32),
+                           search_evalue=np.float64(search_evalue),
+                           **searched)
+
+        return BlastHits(store_path)
+
+    def __len__(self):
+        return len(self.query)
+
+    # rows of hits passing e-value and bitscore cutoffs (None is no cutoff)
+    def view(self, max_evalue=None, min_bitscore=None):
+        mask = np.ones(len(self), dtype=bool)
+        if max_evalue is not None:
+            if max_evalue > self.search_evalue:
+                message = ('hits of {} were searched with e-value {}, the '
+                           'view at {} misses hits').format(
+                    self.store_path, self.search_evalue, max_evalue)
+                utils.print_log(message)
+            mask &= np.asarray(self.evalue) <= max_evalue
+        if min_bitscore is not None:
+            mask &= np.asarray(self.bitscore) >= min_bitscore
+        return np.flatnonzero(mask)
+
+    # query and subject node ids of every hit in two organisms (-1 if absent)
+    def node_ids(self, query_org, subject_org):
+        query_ids = query_org.node_ids(self.queries)
+        subject_ids = subject_org.node_ids(self.subjects)
+        return query_ids[self.query], subject_ids[self.subject]
+
+    # hits between nodes of both organisms that pass the cutoffs as
+    # (query ids, subject ids, rows)
+    def network_hits(self, query_org, subject_org, max_evalue=cs.BLAST_EVALUE,
+                     min_bitscore=cs.BLAST_MIN_BITSCORE):
+        rows = self.view(max_evalue, min_bitscore)
+        ids1, ids2 = self.node_ids(query_org, subject_org)
+        rows = rows[(ids1[rows] >= 0) & (ids2[rows] >= 0)]
+        return ids1[rows], ids2[rows], rows
+
+    # write "query subject bitscore" lines of network hits for external tools
+    def write_scores(self, file_path, query_org, subject_org,
+                     max_evalue=cs.BLAST_EVALUE,
+                     min_bitscore=cs.BLAST_MIN_BITSCORE):
+        ids1, ids2, rows = self.network_hits(query_org, subject_org,
+                                             max_evalue, min_bitscore)
+        names1 = self.queries[self.query[rows]].tolist()
+        names2 = self.subjects[self.subject[rows]].tolist()
+
+        with open(file_path, 'w') as score_file:
+            for s1, s2, score in zip(names1, names2,
+                                     self.bitscore[rows].tolist()):
+                score_file.write(s1 + '\t' + s2 + '\t' + str(score) + '\n')
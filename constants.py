@@ -24,6 +24,7 @@ PROPER_PATH = os.path.join(DATA_PATH, 'PROPER')
 SPINAL_PATH = os.path.join(DATA_PATH, 'SPINAL')
 SVG_PATH = os.path.join(DATA_PATH, 'figures')
 GEPHI_PATH = os.path.join(DATA_PATH, 'figures')
+PPI_FILE = os.path.join(STRING_PATH, 'protein.links.v10.5.txt')
 GO_FILE = os.path.join(STRING_PATH, 'all_go_knowledge_full.tsv')
 REACTOME_PATH = os.path.join(DATA_PATH, 'reactome')
 PW_FILE = os.path.join(REACTOME_PATH, 'UniProt2Reactome_All_Levels.txt')
@@ -36,6 +37,33 @@ CHECK_FILES = False
 # parse constants
 INTERACTION_THR = 921  # threshold for propper interaction score in string_db
 GO_REPORT_FREQ = 1000
+PPI_REPORT_FREQ = 10**6  # report frequency for multi organism ppi parsing
+INDEX_SUFFIX = '.idx.json'  # sidecar byte offset index of string db files
+READ_BUFFER_SIZE = 2**24  # read buffer for (compressed) string db inputs
+PARSE_WORKERS = 1  # process pool size for chunked parsing, 1 is serial
+PARSE_CHUNK_SIZE = 2**26  # byte size of newline aligned parse chunks
+GO_EVIDENCES = ['EXP', 'IDA', 'IMP', 'IGI', 'IEP', 'IPI']
+PIPELINE_WORKERS = 4  # preprocessing steps of a pipeline run concurrently
+DENSE_NODE_LIMIT = 5000  # largest graph with a dense adjacency on request
+SNAPSHOT_VERSION = 1  # organism snapshot layout, older ones are rebuilt
+
+# blast constants
+BLAST_OUTFMT = 'tab'  # blastp output, 'tab' (-outfmt 6) or 'xml' (-outfmt 5)
+BLAST_TAB_COLUMNS = ['qseqid', 'sseqid', 'bitscore', 'evalue', 'pident']
+BLAST_CORES = os.cpu_count() or 1  # concurrent blastp shards
+BLASTP_EXEC = 'blastp'  # blastp executable
+MAKEBLASTDB_EXEC = 'makeblastdb'  # makeblastdb executable
+BLAST_STREAM = True  # parse tabular blastp stdout while the search runs
+BLAST_KEEP_OUTPUT = False  # also write the streamed tabular output to disk
+BLAST_INCREMENTAL = True  # only search new or changed sequences again
+BLAST_DEDUP = True  # search identical sequences once and copy their hits
+BLAST_SEARCH_EVALUE = 10  # e-value of the single permissive blastp search
+BLAST_LEGACY_EVALUE = 0.01  # e-value of results cached without parameters
+BLAST_EVALUE = 0.01  # e-value cutoff of the hits aligners see
+BLAST_MIN_BITSCORE = None  # bitscore cutoff of the hits aligners see
+PARAMS_SUFFIX = '.params.json'  # sidecar search parameters of blastp output
+BLAST_GRID = True  # search several organism pairs against one combined db
+BLAST_MAX_TARGETS = 500  # blastp -max_target_seqs of an organism pair
 
 # power method constants
 POWER_METHOD_REPORT_FREQ = 10**7  # report frequency for power method progress
@@ -123,3 +151,49 @@ MIN_VIS_CUT = 0.00001
 
 # pathway score constants
 PWS2_LIMIT = 2
+
+# sequence scoring constants
+BLAST_LAMBDA = 0.267  # gapped karlin-altschul lambda of BLOSUM62 11/1
+BLAST_K = 0.041  # gapped karlin-altschul K of BLOSUM62 11/1
+BLOSUM62_ALPHABET = 'ARNDCQEGHILKMFPSTWYVBZX*'
+BLOSUM62 = [
+    [4, -1, -2, -2, 0, -1, -1, 0, -2, -1, -1, -1, -1, -2, -1, 1, 0, -3, -2, 0, -2, -1, 0, -4],
+    [-1, 5, 0, -2, -3, 1, 0, -2, 0, -3, -2, 2, -1, -3, -2, -1, -1, -3, -2, -3, -1, 0, -1, -4],
+    [-2, 0, 6, 1, -3, 0, 0, 0, 1, -3, -3, 0, -2, -3, -2, 1, 0, -4, -2, -3, 3, 0, -1, -4],
+    [-2, -2, 1, 6, -3, 0, 2, -1, -1, -3, -4, -1, -3, -3, -1, 0, -1, -4, -3, -3, 4, 1, -1, -4],
+    [0, -3, -3, -3, 9, -3, -4, -3, -3, -1, -1, -3, -1, -2, -3, -1, -1, -2, -2, -1, -3, -3, -2, -4],
+    [-1, 1, 0, 0, -3, 5, 2, -2, 0, -3, -2, 1, 0, -3, -1, 0, -1, -2, -1, -2, 0, 3, -1, -4],
+    [-1, 0, 0, 2, -4, 2, 5, -2, 0, -3, -3, 1, -2, -3, -1, 0, -1, -3, -2, -2, 1, 4, -1, -4],
+    [0, -2, 0, -1, -3, -2, -2, 6, -2, -4, -4, -2, -3, -3, -2, 0, -2, -2, -3, -3, -1, -2, -1, -4],
+    [-2, 0, 1, -1, -3, 0, 0, -2, 8, -3, -3, -1, -2, -1, -2, -1, -2, -2, 2, -3, 0, 0, -1, -4],
+    [-1, -3, -3, -3, -1, -3, -3, -4, -3, 4, 2, -3, 1, 0, -3, -2, -1, -3, -1, 3, -3, -3, -1, -4],
+    [-1, -2, -3, -4, -1, -2, -3, -4, -3, 2, 4, -2, 2, 0, -3, -2, -1, -2, -1, 1, -4, -3, -1, -4],
+    [-1, 2, 0, -1, -3, 1, 1, -2, -1, -3, -2, 5, -1, -3, -1, 0, -1, -3, -2, -2, 0, 1, -1, -4],
+    [-1, -1, -2, -3, -1, 0, -2, -3, -2, 1, 2, -1, 5, 0, -2, -1, -1, -1, -1, 1, -3, -1, -1, -4],
+    [-2, -3, -3, -3, -2, -3, -3, -3, -1, 0, 0, -3, 0, 6, -4, -2, -2, 1, 3, -1, -3, -3, -1, -4],
+    [-1, -2, -2, -1, -3, -1, -1, -2, -2, -3, -3, -1, -2, -4, 7, -1, -1, -4, -3, -2, -2, -1, -2, -4],
+    [1, -1, 1, 0, -1, 0, 0, 0, -1, -2, -2, 0, -1, -2, -1, 4, 1, -3, -2, -2, 0, 0, 0, -4],
+    [0, -1, 0, -1, -1, -1, -1, -2, -2, -1, -1, -1, -1, -2, -1, 1, 5, -2, -2, 0, -1, -1, 0, -4],
+    [-3, -3, -4, -4, -2, -2, -3, -2, -2, -3, -2, -3, -1, 1, -4, -3, -2, 11, 2, -3, -4, -3, -2, -4],
+    [-2, -2, -2, -3, -2, -1, -2, -3, 2, -1, -1, -2, -1, 3, -3, -2, -2, 2, 7, -1, -3, -2, -1, -4],
+    [0, -3, -3, -3, -1, -2, -2, -3, -3, 3, 1, -2, 1, -1, -2, -2, 0, -3, -1, 4, -3, -2, -1, -4],
+    [-2, -1, 3, 4, -3, 0, 1, -1, 0, -3, -4, 0, -3, -3, -2, 0, -1, -4, -3, -3, 4, 1, -1, -4],
+    [-1, 0, 0, 1, -3, 3, 4, -2, 0, -3, -3, 1, -1, -3, -1, 0, -1, -3, -2, -2, 1, 4, -1, -4],
+    [0, -1, -1, -1, -2, -1, -1, -1, -1, -1, -1, -1, -1, -1, -2, 0, 0, -2, -1, -1, -1, -1, -1, -4],
+    [-4, -4, -4, -4, -4, -4, -4, -4, -4, -4, -4, -4, -4, -4, -4, -4, -4, -4, -4, -4, -4, -4, -4, 1],
+]
+
+# k-mer sketch constants
+SKETCH_ALPHABET = 'ACDEFGHIKLMNPQRSTVWY'  # k-mers with other residues are skipped
+SKETCH_K = 4  # residues per k-mer
+SKETCH_BINS = 128  # one permutation minhash bins per sequence
+SKETCH_BAND_ROWS = 2  # bins per lsh band, fewer finds more distant pairs
+SKETCH_MAX_BUCKET = 1000  # lsh buckets with more sequences are skipped
+SKETCH_MIN_SIM = 0.1  # minimum estimated jaccard of reported pairs
+SKETCH_SEED = 0  # k-mer hash seed
+
+# local alignment constants
+SW_GAP_OPEN = 11  # gap open penalty, a gap of length l costs open + l * extend
+SW_GAP_EXTEND = 1  # gap extension penalty
+SW_BATCH_SIZE = 256  # sequence pairs aligned together in one numpy batch
+SW_WORKERS = 1  # process pool size for local alignment batches, 1 is serial
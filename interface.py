@@ -4,16 +4,27 @@ existing source codes. (such as blast, netal, isorank, etc)
 """
 
 import os
+import heapq
+import itertools
 import numpy as np
 from Bio.Blast import NCBIXML
 
 import utils
 import string_db
+import annotation
+import blast_hits
+import scoring
+import sketch
+import local_align
 import constants as cs
 
 
 # blast functions
-def create_blast_db(organism, check_path=cs.BLAST_PATH, check=True):
+# blast db of an organism, or of several sequence stores (e.g. an organism
+# grid). the fasta is fed to makeblastdb through stdin, so no decompressed
+# copy of the sequences is kept
+def create_blast_db(organism, check_path=cs.BLAST_PATH, check=True,
+                    seq_stores=None):
     # the list of file extensions created by makeblastdb
     check_list = [
         '.db.phr',
@@ -24,8 +35,13 @@ def create_blast_db(organism, check_path=cs.BLAST_PATH, check=True):
     ]
 
     file_names = [organism + x for x in check_list]
+    if seq_stores is None:
+        seq_stores = [string_db.parse_organism_seq(organism)]
 
-    if (check and utils.files_exist(file_names, check_path)):
+    # the db is made again when the sequences changed
+    if (check and utils.files_exist(file_names, check_path) and
+            utils.up_to_date(utils.join_path(check_path, file_names[0]),
+                             *[x.store_path for x in seq_stores])):
         message = 'using existing blast db for {}'.format(organism)
         utils.print_log(message)
 
@@ -33,118 +49,717 @@ def create_blast_db(organism, check_path=cs.BLAST_PATH, check=True):
         message = ('using makeblastdb to create db for {}').format(organism)
         utils.print_log(message)
 
-        infile = utils.join_path(cs.STRING_PATH,
-                                 '{}.protein.sequences.v10.5.fa'.
-                                 format(organism))
-
         outfile = utils.join_path(cs.BLAST_PATH, '{}.db'.format(organism))
 
-        utils.run_cmd(('makeblastdb -in {} '
+        utils.run_cmd(('{} -in - -title {} '
                        '-parse_seqids -dbtype prot -out {}'
-                       ).format(infile, outfile))
+                       ).format(cs.MAKEBLASTDB_EXEC, organism, outfile),
+                      input=b''.join([x.fasta_bytes(search_ids(x))
+                                      for x in seq_stores]), check=True)
 
         message = ('create db command finished for {}').format(organism)
         utils.print_log(message)
 
 
+# blastp output file of an organism pair for an output format
+def blast_result_file(org1, org2, outfmt=cs.BLAST_OUTFMT):
+    extension = 'xml' if outfmt == 'xml' else 'tsv'
+    return '{}-{}.{}'.format(org1, org2, extension)
+
+
 def run_blast_prot(org1, org2, check_path=cs.BLAST_PATH,
-                   check=True, eValue='0.01'):
-    file_name = '{}-{}.xml'.format(org1, org2)
+                   check=True, eValue=cs.BLAST_SEARCH_EVALUE,
+                   outfmt=cs.BLAST_OUTFMT,
+                   cores=cs.BLAST_CORES, view_evalue=cs.BLAST_EVALUE):
+    run_blast_prots([(org1, org2)], check_path, check, eValue, outfmt, cores,
+                    view_evalue)
 
-    if (check and utils.file_exists(file_name, check_path)):
-        message = 'using existing blastp results for {}-{}'.format(org1, org2)
+
+# run several blastp searches, sharded and concurrent within a core budget.
+# searches are permissive, consumers filter hits with views of the hit table.
+# cached results are reused if they hold every hit up to view_evalue, the
+# loosest e-value consumers view
+@utils.time_it
+def run_blast_prots(org_pairs, check_path=cs.BLAST_PATH, check=True,
+                    eValue=cs.BLAST_SEARCH_EVALUE, outfmt=cs.BLAST_OUTFMT,
+                    cores=cs.BLAST_CORES, view_evalue=cs.BLAST_EVALUE):
+    # searches as (org1, org2, output file, [(query shard, shard output)])
+    searches = []
+    stream = outfmt != 'xml' and cs.BLAST_STREAM
+    for org1, org2 in org_pairs:
+        file_name = blast_result_file(org1, org2, outfmt)
+        store_name = blast_hits_file(org1, org2)
+
+        # streamed hit tables are updated for new or changed sequences
+        update = (check and stream and cs.BLAST_INCREMENTAL and
+                  os.path.isdir(utils.join_path(check_path, store_name)))
+        if update:
+            hits = blast_hits.BlastHits(utils.join_path(check_path,
+                                                        store_name))
+            update = (hits.searched and
+                      hits.search_evalue >= float(view_evalue))
+        if update and update_blast_hits(org1, org2, hits, check_path, cores,
+                                        view_evalue) is not None:
+            continue
+
+        # results searched with a stricter e-value than views need are
+        # searched again, as are hit tables that could not be updated
+        if (not update and check and
+                cached_blast(org1, org2, check_path, view_evalue, outfmt,
+                             stream)):
+            message = ('using existing blastp results for {}-{}'
+                       ).format(org1, org2)
+            utils.print_log(message)
+            continue
+
+        outfile = utils.join_path(cs.BLAST_PATH, file_name)
+
+        # xml output can not be merged, it always runs as a single shard
+        seq_store = string_db.parse_organism_seq(org1)
+        shards = [search_ids(seq_store)]
+        if outfmt != 'xml':
+            shards = shard_sequences(seq_store, cores, shards[0])
+
+        # (query fasta, output) of every shard
+        if len(shards) == 1:
+            parts = [(seq_store.fasta_bytes(shards[0]), outfile)]
+        else:
+            parts = []
+            for index, ids in enumerate(shards):
+                shard_name = '{}-{}.shard{}.tsv'.format(org1, org2, index)
+                parts.append((seq_store.fasta_bytes(ids),
+                              utils.join_path(cs.BLAST_PATH, shard_name)))
+
+        message = 'running blastp query for {}-{} in {} shards'.format(
+            org1, org2, len(parts))
         utils.print_log(message)
 
+        searches.append((org1, org2, outfile, parts))
+
+    # queries are fed through stdin, streamed searches write to stdout
+    file2 = utils.join_path(cs.BLAST_PATH, '{}.db')
+    commands = [blastp_command('-', file2.format(org2), eValue, outfmt,
+                               None if stream else output,
+                               search_options(org2))
+                for org1, org2, outfile, parts in searches
+                for query, output in parts]
+    queries = [query for org1, org2, outfile, parts in searches
+               for query, output in parts]
+
+    if stream:
+        shard_rows = iter(utils.thread_map(
+            stream_blast_tab, list(zip(commands, queries)), cores))
     else:
-        message = 'running blastp query for {}-{}'.format(org1, org2)
+        utils.run_cmds(commands, cores, inputs=queries)
+
+    for org1, org2, outfile, parts in searches:
+        seq_store = string_db.parse_organism_seq(org1)
+        if stream:
+            rows = sort_blast_rows(
+                itertools.chain(*[next(shard_rows) for x in parts]),
+                seq_store)
+            if cs.BLAST_KEEP_OUTPUT:
+                write_blast_tab(rows, outfile)
+
+            store_path = utils.join_path(check_path,
+                                         blast_hits_file(org1, org2))
+            columns = zip(*rows) if rows else [()] * 5
+            blast_hits.BlastHits.build(
+                store_path, *expand_duplicates(columns, org1, org2),
+                search_evalue=float(eValue), **searched_snapshot(org1, org2))
+
+        elif len(parts) > 1:
+            rows = itertools.chain(*[read_blast_tab(x) for y, x in parts])
+            write_blast_tab(sort_blast_rows(rows, seq_store), outfile)
+
+        if not stream or cs.BLAST_KEEP_OUTPUT:
+            write_search_params(outfile, eValue, outfmt)
+
+        if len(parts) > 1 and not stream:
+            for query, output in parts:
+                os.remove(output)
+
+        message = 'blastp generated ppi for {}-{}'.format(org1, org2)
         utils.print_log(message)
 
-        file1 = utils.join_path(cs.STRING_PATH,
-                                '{}.protein.sequences.v10.5.fa'.
-                                format(org1))
 
-        file2 = utils.join_path(cs.BLAST_PATH, '{}.db'.format(org2))
+# blastp command line, tabular output goes to stdout without an output file
+def blastp_command(query, db, eValue, outfmt=cs.BLAST_OUTFMT, output=None,
+                   options=''):
+    if outfmt == 'xml':
+        blast_format = '5'
+    else:
+        blast_format = '"6 {}"'.format(' '.join(cs.BLAST_TAB_COLUMNS))
 
-        outfile = utils.join_path(cs.BLAST_PATH, '{}-{}.xml'.
-                                                 format(org1, org2))
+    command = ('{} -query {} -db {} -evalue {} -outfmt {}'
+               ).format(cs.BLASTP_EXEC, query, db, eValue, blast_format)
+    if output is not None:
+        command += ' -out {}'.format(output)
+    return command + options
 
-        utils.run_cmd(('blastp -query {} '
-                       '-db {} -out {} -evalue {} -outfmt 5'
-                       ).format(file1, file2, outfile, eValue))
 
-        message = 'blastp generated ppi for {}-{}'.format(org1, org2)
-        utils.print_log(message)
+# blastp options of a search against the db of an organism, e-values are
+# for its whole sequence store as the db leaves out duplicate sequences
+def search_options(org):
+    return ' -max_target_seqs {} -dbsize {}'.format(
+        cs.BLAST_MAX_TARGETS, db_size(org))
+
+
+# residues of all stored sequences of an organism, its blastp db size
+def db_size(org):
+    seq_store = string_db.parse_organism_seq(org)
+    return max(1, int(np.sum(seq_store.lengths)))
+
+
+# search parameters recorded next to blastp output
+def write_search_params(result_path, eValue, outfmt=cs.BLAST_OUTFMT):
+    utils.write_json({'evalue': float(eValue), 'outfmt': outfmt,
+                      'columns': cs.BLAST_TAB_COLUMNS,
+                      'dedup': cs.BLAST_DEDUP},
+                     result_path + cs.PARAMS_SUFFIX)
 
 
+# e-value a blastp output file was searched with
+def searched_evalue(result_path):
+    params_path = result_path + cs.PARAMS_SUFFIX
+    if os.path.exists(params_path):
+        return float(utils.load_json(params_path)['evalue'])
+    return cs.BLAST_LEGACY_EVALUE
+
+
+# whether an organism pair has blastp results searched with an e-value at
+# least as permissive as eValue, streamed searches may only leave a hit table.
+# results of either output format count, load_blast_hits reads both
+def cached_blast(org1, org2, check_path, eValue, outfmt=cs.BLAST_OUTFMT,
+                 stream=cs.BLAST_STREAM):
+    for result_format in [outfmt, 'tab' if outfmt == 'xml' else 'xml']:
+        result_path = utils.join_path(
+            check_path, blast_result_file(org1, org2, result_format))
+        if (os.path.exists(result_path) and
+                searched_evalue(result_path) >= float(eValue)):
+            return True
+
+    store_path = utils.join_path(check_path, blast_hits_file(org1, org2))
+    return (stream and os.path.exists(store_path) and
+            blast_hits.BlastHits(store_path).search_evalue >= float(eValue))
+
+
+# searched proteins, their sequence hashes and the subject db size of an
+# organism pair
+def searched_snapshot(org1, org2):
+    store1 = string_db.parse_organism_seq(org1)
+    store2 = string_db.parse_organism_seq(org2)
+    return {'query_names': store1.names, 'query_hashes': store1.hashes(),
+            'subject_names': store2.names, 'subject_hashes': store2.hashes(),
+            'subject_dbsize': np.int64(db_size(org2))}
+
+
+# search only new or changed sequences and merge them into a hit table,
+# None if the kept hits can not cover view_evalue and a full search is needed
 @utils.time_it
-def blast_xml_to_matrix(bio_net, file_path=cs.BLAST_PATH):
-    # blast_mat = sparse.lil_matrix(bio_net.dim_sim)
-    blast_mat = np.zeros(bio_net.dim_sim)
+def update_blast_hits(org1, org2, hits, check_path=cs.BLAST_PATH,
+                      cores=cs.BLAST_CORES, view_evalue=cs.BLAST_EVALUE):
+    store1 = string_db.parse_organism_seq(org1)
+    store2 = string_db.parse_organism_seq(org2)
+    searched = hits.searched
+
+    # new or changed proteins of both sides
+    changed1 = store1.changed(searched['query_names'],
+                              searched['query_hashes'])
+    changed2 = store2.changed(searched['subject_names'],
+                              searched['subject_hashes'])
+    removed = (np.sum(store1.ids(searched['query_names']) < 0) +
+               np.sum(store2.ids(searched['subject_names']) < 0))
+
+    if not (changed1.any() or changed2.any() or removed):
+        message = 'using existing blastp results for {}-{}'.format(org1, org2)
+        utils.print_log(message)
+        return hits
+
+    # kept e-values are rescaled to the new subject db size. a smaller db
+    # lowers them, hits above the old cutoff were never stored, so the
+    # table then only holds every hit up to a lower e-value
+    scale = None
+    if 'subject_dbsize' in searched:
+        scale = db_size(org2) / float(searched['subject_dbsize'])
+    if scale is None or hits.search_evalue * scale < float(view_evalue):
+        message = ('blastp results for {}-{} can not be updated to the new '
+                   'db size, searching again').format(org1, org2)
+        utils.print_log(message)
+        return None
+    eValue = min(hits.search_evalue, hits.search_evalue * scale)
+
+    message = ('updating blastp results for {}-{}: {} changed queries, '
+               '{} changed subjects, {} removed').format(
+        org1, org2, np.sum(changed1), np.sum(changed2), removed)
+    utils.print_log(message)
+
+    # hits between unchanged proteins are kept, removed proteins drop out
+    ids1 = store1.ids(hits.queries)[hits.query]
+    ids2 = store2.ids(hits.subjects)[hits.subject]
+    kept = np.flatnonzero((ids1 >= 0) & (ids2 >= 0))
+    kept = kept[~changed1[ids1[kept]] & ~changed2[ids2[kept]]]
+
+    # a query at the target cap that loses a subject may have had hits
+    # beyond the cap, it is searched again like a changed query
+    requery = capped_queries(hits) & np.isin(
+        np.arange(len(hits.queries)), hits.query[np.setdiff1d(
+            np.flatnonzero(ids1 >= 0), kept)])
+    changed1 = changed1 | np.isin(np.arange(len(store1)),
+                                  store1.ids(hits.queries[requery]))
+    kept = kept[~changed1[ids1[kept]]]
+    kept_evalues = np.asarray(hits.evalue)[kept] * scale
+    kept = kept[kept_evalues <= eValue]
+    kept_evalues = kept_evalues[kept_evalues <= eValue]
+
+    delta_name = utils.join_path(cs.BLAST_PATH,
+                                 '{}-{}.delta'.format(org1, org2))
+    # (command, query fasta) of the delta searches
+    commands = []
+
+    # changed queries against the whole subject db
+    if changed1.any():
+        commands.append((blastp_command(
+            '-', utils.join_path(cs.BLAST_PATH, '{}.db'.format(org2)),
+            eValue, options=search_options(org2)), store1.fasta_bytes(
+            search_ids(store1, np.flatnonzero(changed1)))))
+
+    # unchanged queries against a db of the changed subjects, e-values are
+    # computed for the size of the whole subject db
+    if changed2.any() and not changed1.all():
+        utils.run_cmd(('{} -in - -title {}-{}.delta '
+                       '-parse_seqids -dbtype prot -out {}'
+                       ).format(cs.MAKEBLASTDB_EXEC, org1, org2,
+                                delta_name + '.db'),
+                      input=store2.fasta_bytes(
+                          search_ids(store2, np.flatnonzero(changed2))),
+                      check=True)
+        commands.append((blastp_command(
+            '-', delta_name + '.db', eValue, options=search_options(org2)),
+            store1.fasta_bytes(
+                search_ids(store1, np.flatnonzero(~changed1)))))
+
+    rows = list(itertools.chain(
+        *utils.thread_map(stream_blast_tab, commands, cores)))
+    columns = expand_duplicates(zip(*rows) if rows else [()] * 5,
+                                org1, org2)
+
+    # copies of identical sequences may repeat kept hits, kept ones win
+    columns = first_hsp_columns(*[np.concatenate([old, new])
+                                  for old, new in zip(
+        [hits.queries[hits.query[kept]], hits.subjects[hits.subject[kept]],
+         hits.bitscore[kept], kept_evalues, hits.identity[kept]],
+        columns)])
+
+    # hits are ordered by query, best first, ties in subject db order
+    order = np.lexsort((store2.ids(columns[1]), -columns[2],
+                        store1.ids(columns[0])))
+    columns = [x[order] for x in columns]
+
+    # kept and new subjects of a query are capped like a single search,
+    # which caps searched representatives before their copies are added
+    subject_keys = columns[1]
+    if cs.BLAST_DEDUP:
+        subject_keys = store2.duplicate_groups()[0][store2.ids(columns[1])]
+    keep = first_targets(columns[0], subject_keys, cs.BLAST_MAX_TARGETS)
+    columns = [x[keep] for x in columns]
+
+    for file_name in os.listdir(cs.BLAST_PATH):
+        if file_name.startswith('{}-{}.delta'.format(org1, org2)):
+            os.remove(utils.join_path(cs.BLAST_PATH, file_name))
+
+    store_path = utils.join_path(check_path, blast_hits_file(org1, org2))
+    return blast_hits.BlastHits.build(store_path, *columns,
+                                      search_evalue=eValue,
+                                      **searched_snapshot(org1, org2))
+
+
+# mask of the query table of a hit table, queries with hits to
+# BLAST_MAX_TARGETS subjects (identical sequences count once)
+def capped_queries(hits):
+    subject_keys = np.asarray(hits.subject, dtype=np.uint64)
+    if cs.BLAST_DEDUP:
+        old_hashes = dict(zip(hits.searched['subject_names'].tolist(),
+                              hits.searched['subject_hashes'].tolist()))
+        subject_keys = np.array([old_hashes.get(x, 0) for x in
+                                 hits.subjects.tolist()],
+                                dtype=np.uint64)[hits.subject]
+
+    pairs = np.unique(np.stack([np.asarray(hits.query, dtype=np.uint64),
+                                subject_keys], axis=1), axis=0)
+    counts = np.bincount(pairs[:, 0].astype(np.int64),
+                         minlength=len(hits.queries))
+    return counts >= cs.BLAST_MAX_TARGETS
+
+
+# blast db name of an organism grid
+def blast_grid_name(org_ids):
+    return 'grid-{}'.format('-'.join(sorted(org_ids)))
+
+
+# search the organism pairs of a grid (by default all pairs of org_ids and
+# self pairs) with one combined db and a single sharded all-vs-all blastp
+# run, its hits are sliced into the hit table of every pair
+@utils.time_it
+def run_blast_grid(org_ids, org_pairs=None, check_path=cs.BLAST_PATH,
+                   check=True, eValue=cs.BLAST_SEARCH_EVALUE,
+                   cores=cs.BLAST_CORES, view_evalue=cs.BLAST_EVALUE):
+    if org_pairs is None:
+        org_pairs = list(itertools.combinations_with_replacement(
+            sorted(org_ids), 2))
+
+    # pairs with results are reused or updated on their own
+    cached = [x for x in org_pairs if check and
+              cached_blast(x[0], x[1], check_path, view_evalue, 'tab', True)]
+    if cached:
+        list(map(create_blast_db, sorted(set(x[1] for x in cached))))
+        run_blast_prots(cached, check_path, check, eValue, 'tab', cores,
+                        view_evalue)
+    org_pairs = [x for x in org_pairs if x not in cached]
+    if not org_pairs:
+        return
+
+    grid_orgs = sorted(set(itertools.chain(*org_pairs)))
+    stores = {x: string_db.parse_organism_seq(x) for x in grid_orgs}
+    grid_name = blast_grid_name(grid_orgs)
+
+    # the combined db is made from the sequence stores of the organisms
+    create_blast_db(grid_name, check_path, check,
+                    [stores[x] for x in grid_orgs])
+
+    # e-values of the combined db are rescaled to the subject organism db
+    # later, the search cutoff leaves room for the smallest organism. sizes
+    # count all stored sequences, also the duplicates left out of the db
+    db_sizes = {x: max(1, int(np.sum(stores[x].lengths)))
+                for x in grid_orgs}
+    grid_size = sum(db_sizes.values())
+    search_evalue = float(eValue) * grid_size / min(db_sizes.values())
+
+    # the combined db is searched without a target cap, a query may have
+    # most of its hits in one organism. every pair is capped on its own
+    grid_count = sum([len(search_ids(x)) for x in stores.values()])
+    options = ' -max_target_seqs {} -dbsize {}'.format(
+        max(1, grid_count), grid_size)
+    grid_db = utils.join_path(cs.BLAST_PATH, grid_name + '.db')
+    queries = []
+    for org in sorted(set(x[0] for x in org_pairs)):
+        seq_store = stores[org]
+        shards = shard_sequences(seq_store, cores, search_ids(seq_store))
+        queries += [seq_store.fasta_bytes(x) for x in shards]
+
+    message = 'running grid blastp query for {} in {} shards'.format(
+        grid_name, len(queries))
+    utils.print_log(message)
+
+    command = blastp_command('-', grid_db, search_evalue, options=options)
+    rows = list(itertools.chain(*utils.thread_map(
+        stream_blast_tab, [(command, x) for x in queries], cores)))
+    columns = [np.array(x) for x in (zip(*rows) if rows else [()] * 5)]
+
+    for org1, org2 in org_pairs:
+        mask = ((stores[org1].ids(columns[0]) >= 0) &
+                (stores[org2].ids(columns[1]) >= 0))
+        pair = [x[mask] for x in columns]
+
+        # e-values as if org2 was searched on its own
+        pair[3] = pair[3].astype(np.float64) * db_sizes[org2] / grid_size
+        keep = pair[3] <= float(eValue)
+        pair = [x[keep] for x in pair]
+
+        # hits are in blastp order, so the cap keeps the best targets
+        keep = first_targets(pair[0], pair[1], cs.BLAST_MAX_TARGETS)
+        pair = expand_duplicates([x[keep] for x in pair], org1, org2)
+
+        store_path = utils.join_path(check_path, blast_hits_file(org1, org2))
+        blast_hits.BlastHits.build(store_path, *pair,
+                                   search_evalue=float(eValue),
+                                   **searched_snapshot(org1, org2))
+
+        message = 'grid blastp generated ppi for {}-{}'.format(org1, org2)
+        utils.print_log(message)
+
+
+# mask of rows hitting one of the first max_targets subjects of their query,
+# subjects are ranked by their first row
+def first_targets(queries, subjects, max_targets):
+    query_codes = np.unique(queries, return_inverse=True)[1].reshape(-1)
+    subject_codes = np.unique(subjects, return_inverse=True)[1].reshape(-1)
+    pair_codes = (query_codes * (subject_codes.max(initial=0) + 1) +
+                  subject_codes)
+    first, pair_rows = np.unique(pair_codes, return_index=True,
+                                 return_inverse=True)[1:]
+
+    # rank of every pair among the pairs of its query in row order
+    first_queries = query_codes[first]
+    order = np.lexsort((first, first_queries))
+    starts = np.searchsorted(first_queries[order], first_queries[order])
+    ranks = np.empty(len(first), dtype=np.int64)
+    ranks[order] = np.arange(len(first)) - starts
+
+    return ranks[pair_rows.reshape(-1)] < max_targets
+
+
+# store positions to search, one protein per identical sequence group
+def search_ids(seq_store, ids=None):
+    if cs.BLAST_DEDUP:
+        return seq_store.representatives(ids)
+    return np.arange(len(seq_store)) if ids is None else np.asarray(ids)
+
+
+# copy hits of searched representatives to every protein with the same
+# sequence, rows end up ordered by query and keep their blastp order
+def expand_duplicates(columns, org1, org2):
+    columns = [np.asarray(x) for x in columns]
+    if not cs.BLAST_DEDUP:
+        return first_hsp_columns(*columns)
+
+    store1 = string_db.parse_organism_seq(org1)
+    store2 = string_db.parse_organism_seq(org2)
+
+    rows, members1 = store1.members(store1.ids(columns[0]))
+    sub_rows, members2 = store2.members(store2.ids(columns[1][rows]))
+    members1 = members1[sub_rows]
+    rows = rows[sub_rows]
+
+    order = np.argsort(members1, kind='stable')
+    return first_hsp_columns(store1.names[members1[order]],
+                             store2.names[members2[order]],
+                             *[x[rows[order]] for x in columns[2:]])
+
+
+# split store proteins into length balanced shards (longest first greedy)
+def shard_sequences(seq_store, shard_count, ids=None):
+    shards = [[] for x in range(max(1, shard_count))]
+    totals = [(0, x) for x in range(len(shards))]
+    if ids is None:
+        ids = np.arange(len(seq_store))
+    ids = np.asarray(ids)
+
+    lengths = seq_store.lengths[ids]
+    for ind in ids[np.argsort(-lengths, kind='stable')].tolist():
+        total, shard = heapq.heappop(totals)
+        shards[shard].append(ind)
+        heapq.heappush(totals, (total + int(seq_store.lengths[ind]), shard))
 
-    result_file = '{}-{}.xml'.format(bio_net.org1.org_id, bio_net.org2.org_id)
+    # proteins keep their fasta order inside a shard
+    return [sorted(x) for x in shards if x] or [[]]
+
+
+# parse tabular blastp stdout into rows while the search is running, args
+# are the command and its query fasta bytes
+def stream_blast_tab(args):
+    command, query = args
+    return [x.rstrip('\n').split('\t')
+            for x in utils.stream_cmd(command, query)
+            if x.strip() and x[0] != '#']
+
+
+def read_blast_tab(file_path):
+    with open(file_path) as tab_file:
+        return [x.rstrip('\n').split('\t') for x in tab_file
+                if x.strip() and x[0] != '#']
+
+
+def write_blast_tab(rows, file_path):
+    with open(file_path + '.tmp', 'w') as tab_file:
+        tab_file.writelines('\t'.join(x) + '\n' for x in rows)
+    os.rename(file_path + '.tmp', file_path)
+
+
+# merge shard rows in the query order of the sequence store
+def sort_blast_rows(rows, seq_store):
+    # sorting is stable so hits of a query keep their blastp order
+    position = seq_store.index
+    return sorted(rows, key=lambda x: position.get(x[0], -1))
+
+
+# hit table directory of an organism pair
+def blast_hits_file(org1, org2):
+    return '{}-{}.hits'.format(org1, org2)
+
+
+# ingest blastp output once into a columnar hit table
+@utils.time_it
+def load_blast_hits(org1, org2, file_path=cs.BLAST_PATH, check=True):
+    store_name = blast_hits_file(org1, org2)
+    store_path = utils.join_path(file_path, store_name)
+
+    # the configured output format is preferred if both exist
+    result_file = blast_result_file(org1, org2)
+    if not utils.file_exists(result_file, file_path):
+        result_file = blast_result_file(
+            org1, org2, 'tab' if cs.BLAST_OUTFMT == 'xml' else 'xml')
     result_file = utils.join_path(file_path, result_file)
 
+    # the hit table is stale if blastp ran again after it was built
+    if (check and os.path.isdir(store_path) and
+            (not os.path.exists(result_file) or
+             os.path.getmtime(store_path) >= os.path.getmtime(result_file))):
+        return blast_hits.BlastHits(store_path)
+
+    message = 'ingesting blastp results for {}-{}'.format(org1, org2)
+    utils.print_log(message)
+
+    if result_file.endswith('.xml'):
+        columns = parse_blast_xml(result_file)
+    else:
+        columns = parse_blast_tab(result_file)
+
+    # result files of deduplicated searches only name representatives
+    if cs.BLAST_DEDUP:
+        columns = expand_duplicates(columns, org1, org2)
+
+    return blast_hits.BlastHits.build(store_path, *columns,
+                                      search_evalue=searched_evalue(
+                                          result_file))
+
+
+# hit columns of xml blastp output, first hsp of every alignment
+def parse_blast_xml(result_file):
+    queries, subjects, bitscores, evalues, identities = [], [], [], [], []
     with open(result_file) as result_handle:
         blast_records = NCBIXML.parse(result_handle)
         for blast_record in blast_records:
-            s1 = blast_record.query
+            s1 = blast_record.query.split()[0]
             for alignment in blast_record.alignments:
-                s2 = alignment.title.split()[0]
-                # there might be new nodes not connected to anything
-                id1 = bio_net.org1.node_to_id.get(s1, None)
-                id2 = bio_net.org2.node_to_id.get(s2, None)
-                if id1 and id2:
-                    blast_mat[bio_net.v_ind(id1, id2)] = alignment.hsps[0].bits
+                hsp = alignment.hsps[0]
+                queries.append(s1)
+                subjects.append(alignment.title.split()[0])
+                bitscores.append(hsp.bits)
+                evalues.append(hsp.expect)
+                identities.append(100 * hsp.identities / hsp.align_length)
+
+    return queries, subjects, bitscores, evalues, identities
 
-    return blast_mat
+
+# hit columns of tabular blastp output, first (best) hsp of every pair
+def parse_blast_tab(result_file):
+    dtype = {'names': cs.BLAST_TAB_COLUMNS,
+             'formats': ['U64', 'U64', 'f8', 'f8', 'f4']}
+    table = np.loadtxt(result_file, dtype=dtype, delimiter='\t',
+                       comments='#', ndmin=1)
+
+    return first_hsp_columns(table['qseqid'], table['sseqid'],
+                             table['bitscore'], table['evalue'],
+                             table['pident'])
+
+
+# keep the first (best) hsp row of every (query, subject) pair
+def first_hsp_columns(queries, subjects, bitscores, evalues, identities):
+    queries = np.array(queries, dtype=str)
+    subjects = np.array(subjects, dtype=str)
+
+    # later hsps of a (query, subject) pair are extra rows
+    pairs = np.char.add(np.char.add(queries, '\t'), subjects)
+    first = np.sort(np.unique(pairs, return_index=True)[1])
+
+    return (queries[first], subjects[first],
+            np.array(bitscores, dtype=np.float64)[first],
+            np.array(evalues, dtype=np.float64)[first],
+            np.array(identities, dtype=np.float32)[first])
 
 
 @utils.time_it
-def self_blast_xml_to_vec(organism, file_path=cs.BLAST_PATH):
+def blast_xml_to_matrix(bio_net, file_path=cs.BLAST_PATH):
     # blast_mat = sparse.lil_matrix(bio_net.dim_sim)
-    blast_vec = np.zeros(organism.node_count)
+    blast_mat = np.zeros(bio_net.dim_sim)
 
-    result_file = '{}-{}.xml'.format(organism.org_id, organism.org_id)
-    result_file = utils.join_path(file_path, result_file)
+    hits = load_blast_hits(bio_net.org1.org_id, bio_net.org2.org_id,
+                           file_path)
 
-    with open(result_file) as result_handle:
-        blast_records = NCBIXML.parse(result_handle)
-        for blast_record in blast_records:
-            s1 = blast_record.query
-            for alignment in blast_record.alignments:
-                s2 = alignment.title.split()[0]
-                # there might be new nodes not connected to anything
-                id1 = organism.node_to_id.get(s1, None)
-                if id1 and s1 == s2:
-                    blast_vec[id1] = alignment.hsps[0].bits
+    # there might be new nodes not connected to anything
+    ids1, ids2, rows = hits.network_hits(bio_net.org1, bio_net.org2)
+    blast_mat[bio_net.v_ind(ids1, ids2)] = hits.bitscore[rows]
+
+    return blast_mat
+
+
+# self alignment bitscores of the proteins of an organism, cached per org
+def self_score_vec(organism, file_path=cs.NP_PATH):
+    file_name = '{}_self_scores.npy'.format(organism.org_id)
+    seq_store = string_db.parse_organism_seq(organism.org_id)
+
+    # scores of an older sequence store are computed again
+    score_file = utils.join_path(file_path, file_name)
+    scores = None
+    if utils.up_to_date(score_file, seq_store.store_path):
+        scores = utils.load_np(score_file)
+        if len(scores) != len(seq_store):
+            scores = None
+
+    if scores is None:
+        message = 'scoring self alignments for {}'.format(organism.org_id)
+        utils.print_log(message)
+
+        scores = scoring.bit_scores(scoring.self_scores(seq_store))
+        utils.write_np(scores, score_file)
 
-    return blast_vec
+    # scores follow the sequence store order
+    score_vec = np.zeros(organism.node_count)
+    ids = organism.node_ids(seq_store.names)
+    score_vec[ids[ids >= 0]] = scores[ids >= 0]
+
+    return score_vec
+
+
+# minhash signatures of the proteins of an organism, cached per org and
+# sketch parameters
+def organism_sketch(org_id, file_path=cs.NP_PATH):
+    file_name = '{}_sketch-k{}-b{}-s{}.npy'.format(
+        org_id, cs.SKETCH_K, cs.SKETCH_BINS, cs.SKETCH_SEED)
+    seq_store = string_db.parse_organism_seq(org_id)
+
+    sketch_file = utils.join_path(file_path, file_name)
+    if utils.up_to_date(sketch_file, seq_store.store_path):
+        return utils.load_np(sketch_file)
+
+    message = 'sketching sequences of {}'.format(org_id)
+    utils.print_log(message)
+
+    signatures = sketch.signatures(seq_store)
+    utils.write_np(signatures, sketch_file)
+    return signatures
+
+
+# k-mer sketch similarity of network nodes as a flat similarity vector,
+# a blastp free stand in for blast_xml_to_matrix. with rescore the sketch
+# candidates get smith-waterman bit scores instead of their jaccard
+@utils.time_it
+def sketch_to_matrix(bio_net, rescore=False):
+    sketch_mat = np.zeros(bio_net.dim_sim)
+
+    sim = sketch.similarity(organism_sketch(bio_net.org1.org_id),
+                            organism_sketch(bio_net.org2.org_id)).tocoo()
+
+    # pairs are sequence store positions, proteins outside the networks drop
+    seq_store1 = string_db.parse_organism_seq(bio_net.org1.org_id)
+    seq_store2 = string_db.parse_organism_seq(bio_net.org2.org_id)
+    ids1 = bio_net.org1.node_ids(seq_store1.names)[sim.row]
+    ids2 = bio_net.org2.node_ids(seq_store2.names)[sim.col]
+    mask = (ids1 >= 0) & (ids2 >= 0)
+
+    scores = sim.data[mask]
+    if rescore:
+        message = 'aligning {} sketch candidates for {}-{}'.format(
+            np.sum(mask), bio_net.org1.org_id, bio_net.org2.org_id)
+        utils.print_log(message)
+        scores = local_align.pair_bit_scores(seq_store1, seq_store2,
+                                             sim.row[mask], sim.col[mask])
+
+    sketch_mat[bio_net.v_ind(ids1[mask], ids2[mask])] = scores
+
+    return sketch_mat
 
 
 # isorankN functions
 def blast_xml_to_eval(org1, org2, file_path=cs.BLAST_PATH,
                       isoN_path=cs.ISON_PATH):
-    result_file = '{}-{}.xml'.format(org1.org_id, org2.org_id)
-    result_file = utils.join_path(file_path, result_file)
-
     eval_name = '{}-{}.evals'.format(org1.org_id, org2.org_id)
     eval_file = utils.join_path(isoN_path, eval_name)
 
     if not os.path.exists(eval_file):
-        with open(result_file) as result_handle:
-            blast_records = NCBIXML.parse(result_handle)
-            with open(eval_file, 'w') as eval_handle:
-                for blast_record in blast_records:
-                    s1 = blast_record.query
-                    for alignment in blast_record.alignments:
-                        s2 = alignment.title.split()[0]
-                        # there might be new nodes not connected to anything
-                        id1 = org1.node_to_id.get(s1, None)
-                        id2 = org2.node_to_id.get(s2, None)
-                        if id1 and id2:
-                            e_score = alignment.hsps[0].bits
-                            line = (s1 + '\t' + s2 + '\t' + str(e_score) + '\n')
-                            eval_handle.write(line)
+        hits = load_blast_hits(org1.org_id, org2.org_id, file_path)
+        hits.write_scores(eval_file, org1, org2)
 
 
 def generate_tab_file(organism, file_path=cs.ISON_PATH):
@@ -251,40 +866,16 @@ def isorankN_align(bio_net, file_path=cs.ISON_PATH, check=True):
 # NETAL functions
 def blast_xml_to_val(org1, org2, file_path=cs.BLAST_PATH,
                      out_path=cs.NETAL_PATH):
-    result_file = '{}-{}.xml'.format(min(org1.org_id, org2.org_id),
-                                     max(org1.org_id, org2.org_id))
-    result_file = utils.join_path(file_path, result_file)
-
     eval_name = '{}-{}.val'.format(org1.org_id, org2.org_id)
     eval_file = utils.join_path(out_path, eval_name)
 
-    reverse = ((org1.org_id, org2.org_id) != (min(org1.org_id, org2.org_id),
-                                              max(org1.org_id, org2.org_id)))
-    with open(result_file) as result_handle:
-        blast_records = NCBIXML.parse(result_handle)
-        with open(eval_file, 'w') as eval_handle:
-            for blast_record in blast_records:
-                if not reverse:
-                    s1 = blast_record.query
-                else:
-                    s2 = blast_record.query
-                for alignment in blast_record.alignments:
-                    if not reverse:
-                        s2 = alignment.title.split()[0]
-                    else:
-                        s1 = alignment.title.split()[0]
-                    # there might be new nodes not connected to anything
-                    id1 = org1.node_to_id.get(s1, None)
-                    id2 = org2.node_to_id.get(s2, None)
-                    if id1 and id2:
-                        e_score = alignment.hsps[0].bits
-                        if not reverse:
-                            line = (s1 + '\t' + s2 + '\t' +
-                                    str(e_score) + '\n')
-                        else:
-                            line = (s2 + '\t' + s1 + '\t' +
-                                    str(e_score) + '\n')
-                        eval_handle.write(line)
+    # blastp only ran for the sorted pair, queries are the smaller org id
+    if org1.org_id <= org2.org_id:
+        hits = load_blast_hits(org1.org_id, org2.org_id, file_path)
+        hits.write_scores(eval_file, org1, org2)
+    else:
+        hits = load_blast_hits(org2.org_id, org1.org_id, file_path)
+        hits.write_scores(eval_file, org2, org1)
 
 
 def generate_netal_tab_file(organism, file_path=cs.NETAL_PATH):
@@ -377,27 +968,12 @@ def NETAL_align(bio_net, file_path=cs.NETAL_PATH, check=True):
 # pinalog functions
 def blast_xml_to_score(org1, org2, file_path=cs.BLAST_PATH,
                        out_path=cs.PINALOG_PATH):
-    result_file = '{}-{}.xml'.format(org1.org_id, org2.org_id)
-    result_file = utils.join_path(file_path, result_file)
-
     eval_name = '{}-{}.blast_score'.format(org1.org_id, org2.org_id)
     eval_file = utils.join_path(out_path, eval_name)
 
     if not os.path.exists(eval_file):
-        with open(result_file) as result_handle:
-            blast_records = NCBIXML.parse(result_handle)
-            with open(eval_file, 'w') as eval_handle:
-                for blast_record in blast_records:
-                    s1 = blast_record.query
-                    for alignment in blast_record.alignments:
-                        s2 = alignment.title.split()[0]
-                        # there might be new nodes not connected to anything
-                        id1 = org1.node_to_id.get(s1, None)
-                        id2 = org2.node_to_id.get(s2, None)
-                        if id1 and id2:
-                            e_score = alignment.hsps[0].bits
-                            line = (s1 + '\t' + s2 + '\t' + str(e_score) + '\n')
-                            eval_handle.write(line)
+        hits = load_blast_hits(org1.org_id, org2.org_id, file_path)
+        hits.write_scores(eval_file, org1, org2)
 
     return eval_name
 
@@ -480,26 +1056,11 @@ def pinalog_align(bio_net, file_path=cs.PINALOG_PATH, check=True):
 # C-GRAAL functions
 def blast_xml_to_sim(org1, org2, file_path=cs.BLAST_PATH,
                      out_path=cs.CGRAAL_PATH):
-    result_file = '{}-{}.xml'.format(org1.org_id, org2.org_id)
-    result_file = utils.join_path(file_path, result_file)
-
     sim_name = '{}-{}-sim.txt'.format(org1.org_id, org2.org_id)
     sim_file = utils.join_path(out_path, sim_name)
 
-    with open(result_file) as result_handle:
-        blast_records = NCBIXML.parse(result_handle)
-        with open(sim_file, 'w') as sim_handle:
-            for blast_record in blast_records:
-                s1 = blast_record.query
-                for alignment in blast_record.alignments:
-                    s2 = alignment.title.split()[0]
-                    # there might be new nodes not connected to anything
-                    id1 = org1.node_to_id.get(s1, None)
-                    id2 = org2.node_to_id.get(s2, None)
-                    if id1 and id2:
-                        e_score = alignment.hsps[0].bits
-                        line = (s1 + '\t' + s2 + '\t' + str(e_score) + '\n')
-                        sim_handle.write(line)
+    hits = load_blast_hits(org1.org_id, org2.org_id, file_path)
+    hits.write_scores(sim_file, org1, org2)
 
     return sim_name
 
@@ -1144,58 +1705,73 @@ org_codes = {
 }
 
 
+# pathway index of an organism, reactome pathways -> string proteins
 def get_pathways(org, pw_file=cs.PW_FILE, save_path=cs.JSON_PATH):
-    file_name = '{}.pathways.json'.format(org)
+    file_name = '{}.pathways.store'.format(org)
     file_path = utils.join_path(save_path, file_name)
 
-    if (utils.file_exists(file_name, save_path)):
+    if os.path.isdir(file_path):
         message = 'pathways already stored for {}'.format(org)
         utils.print_log(message)
 
-        return utils.load_json(file_path)
+        return annotation.AnnotationStore(file_path)
 
     else:
-        message = 'parsing pathways from reactome for {}'.format(org)
-        utils.print_log(message)
+        # other organisms share the pass only if their mapping is there
+        orgs = [x for x in org_codes if x == org or
+                os.path.isfile(string_db.uniprot_map_file(x))]
+        return build_pathway_index(orgs, pw_file, save_path)[org]
+
 
-        # organism pathway dict
-        pdict = {}
-
-        # uniprot mapping
-        mapping = string_db.get_uniprot_map(org)
-
-        # org code
-        code = org_codes[org]
-
-        with open(pw_file, 'r') as index:
-            while True:
-                line = index.readline()
-                line = line.strip()
-
-                if line == '':
-                    break
-
-                try:
-                    words = line.split('\t')
-                    # UniProt identifier
-                    uniprot_ac = words[0]
-                    # Reactome Pathway Stable identifier
-                    pathway_id = words[1]
-                    pathway_org = pathway_id.split('-')[1]
-                    pathway_code = pathway_id.split('-')[2]
-                    # # Evidence Code
-                    # pathway_code = words[4]
-                    # string prot code
-                    prot = mapping[uniprot_ac]
-                    if pathway_org == code:
-                        pdict[pathway_code] = pdict.get(pathway_code,
-                                                        []) + [prot]
-                except KeyError:
-                    continue
-
-        utils.write_json(pdict, file_path)
-
-        return pdict
+# parse pathways of all organisms in org_codes in one pass over reactome
+@utils.time_it
+def build_pathway_index(orgs=org_codes, pw_file=cs.PW_FILE,
+                        save_path=cs.JSON_PATH):
+    message = 'parsing pathways from reactome for {}'.format(list(orgs))
+    utils.print_log(message)
+
+    # uniprot mappings by reactome org code
+    mappings = {org_codes[org]: string_db.get_uniprot_map(org)
+                for org in orgs}
+    members = {code: ([], []) for code in mappings}
+
+    with utils.open_file(string_db.input_file(pw_file), 'r') as index:
+        for line in index:
+            words = line.strip().split('\t')
+            if len(words) < 2:
+                continue
+
+            # UniProt identifier
+            uniprot_ac = words[0]
+            # Reactome Pathway Stable identifier
+            pathway_id = words[1].split('-')
+            if len(pathway_id) < 3 or pathway_id[1] not in mappings:
+                continue
+
+            # string prot code
+            prot = mappings[pathway_id[1]].get(uniprot_ac)
+            if prot is not None:
+                pathways, prots = members[pathway_id[1]]
+                pathways.append(pathway_id[2])
+                prots.append(prot)
+
+    stores = {}
+    for org in orgs:
+        file_path = utils.join_path(save_path,
+                                    '{}.pathways.store'.format(org))
+        pathways, prots = members[org_codes[org]]
+        stores[org] = annotation.AnnotationStore.build(
+            file_path, pathways, prots, unique=True)
+
+    return stores
+
+
+# (pathway position, network node id) of all members of the pathways
+def pathway_nodes(pw_store, pathways, org):
+    nodes = np.array([org.node_to_id.get(x, -1)
+                      for x in pw_store.terms.tolist()], dtype=np.int64)
+    positions, terms = pw_store.expand(pw_store.key_ids(pathways))
+    return positions, nodes[terms]
 
 
 # optnet functions
@@ -0,0 +1,116 @@
+"""
+this module contains an in process smith-waterman scorer for batches of
+candidate sequence pairs. pairs of similar lengths are aligned together and
+every batch fills its dynamic programming matrices one anti-diagonal at a
+time, so each numpy operation covers all cells of a diagonal of all pairs
+"""
+
+import numpy as np
+
+import utils
+import scoring
+import constants as cs
+
+
+# best local alignment score (affine gaps) of every pair seqs1[i], seqs2[i]
+# of sequence bytes
+def sw_scores(seqs1, seqs2, table=None, gap_open=cs.SW_GAP_OPEN,
+              gap_extend=cs.SW_GAP_EXTEND, batch_size=cs.SW_BATCH_SIZE,
+              workers=cs.SW_WORKERS):
+    if table is None:
+        table = scoring.substitution_table()
+    scores = np.zeros(len(seqs1), dtype=np.int64)
+
+    # similar lengths share a batch to keep the padding of both small
+    lengths1 = np.array([len(x) for x in seqs1], dtype=np.int64)
+    lengths2 = np.array([len(x) for x in seqs2], dtype=np.int64)
+    order = np.lexsort((lengths2, lengths1))
+    order = order[(lengths1[order] > 0) & (lengths2[order] > 0)]
+
+    batches = [order[start:start + batch_size]
+               for start in range(0, len(order), batch_size)]
+    results = utils.parallel_map(
+        batch_scores, [([seqs1[x] for x in batch], [seqs2[x] for x in batch],
+                        table, gap_open, gap_extend) for batch in batches],
+        workers)
+
+    for batch, result in zip(batches, results):
+        scores[batch] = result
+    return scores
+
+
+# smith-waterman scores of one batch as (seqs1, seqs2, table, gap open,
+# gap extend), row i of the matrices is residue i of the first sequences
+def batch_scores(args):
+    seqs1, seqs2, table, gap_open, gap_extend = args
+    codes1, lengths1 = pad_sequences(seqs1)
+    codes2, lengths2 = pad_sequences(seqs2)
+    count, rows = codes1.shape
+    cols = codes2.shape[1]
+
+    # a gap of length l costs gap_open + l * gap_extend
+    first_gap = gap_open + gap_extend
+    low = np.iinfo(np.int32).min // 2
+
+    # H, E (gap in the first sequence) and F (gap in the second sequence)
+    # of the last two anti-diagonals, indexed by row (0 is the border).
+    # buffers are reused: a diagonal only reads rows written by the last
+    # two diagonals or rows no diagonal has written yet
+    h_prev2 = np.zeros((count, rows + 1), dtype=np.int32)
+    h_prev = np.zeros((count, rows + 1), dtype=np.int32)
+    h_cur = np.zeros((count, rows + 1), dtype=np.int32)
+    e_prev = np.full((count, rows + 1), low, dtype=np.int32)
+    f_prev = np.full((count, rows + 1), low, dtype=np.int32)
+    e_cur = np.full((count, rows + 1), low, dtype=np.int32)
+    f_cur = np.full((count, rows + 1), low, dtype=np.int32)
+    best = np.zeros(count, dtype=np.int32)
+
+    row_ids = np.arange(rows + 1)
+    for diag in range(2, rows + cols + 1):
+        # cells (i, diag - i) of the diagonal
+        start, end = max(1, diag - cols), min(rows, diag - 1)
+        i = slice(start, end + 1)
+        up = slice(start - 1, end)
+
+        subs = table[codes1[:, start - 1:end],
+                     codes2[:, diag - end - 1:diag - start][:, ::-1]]
+
+        e_cur[:, i] = np.maximum(e_prev[:, i] - gap_extend,
+                                 h_prev[:, i] - first_gap)
+        f_cur[:, i] = np.maximum(f_prev[:, up] - gap_extend,
+                                 h_prev[:, up] - first_gap)
+        h_cur[:, i] = np.maximum(
+            np.maximum(h_prev2[:, up] + subs, 0),
+            np.maximum(e_cur[:, i], f_cur[:, i]))
+
+        # cells outside a pair's own lengths stay empty
+        valid = ((row_ids[None, i] <= lengths1[:, None]) &
+                 (diag - row_ids[None, i] <= lengths2[:, None]))
+        h_cur[:, i] *= valid
+        best = np.maximum(best, h_cur[:, i].max(axis=1))
+
+        h_prev2, h_prev, h_cur = h_prev, h_cur, h_prev2
+        e_prev, e_cur = e_cur, e_prev
+        f_prev, f_cur = f_cur, f_prev
+
+    return best
+
+
+# sequence bytes as a zero padded (sequences x longest) byte array
+def pad_sequences(seqs):
+    lengths = np.array([len(x) for x in seqs], dtype=np.int64)
+    codes = np.zeros((len(seqs), max(lengths.max(initial=0), 1)),
+                     dtype=np.uint8)
+    for index, seq in enumerate(seqs):
+        codes[index, :len(seq)] = np.frombuffer(seq, dtype=np.uint8)
+    return codes, lengths
+
+
+# smith-waterman bit scores of sequence store pairs store1[ids1[i]],
+# store2[ids2[i]] without a blast database
+def pair_bit_scores(seq_store1, seq_store2, ids1, ids2,
+                    workers=cs.SW_WORKERS):
+    seqs1 = [seq_store1.sequence_bytes(x) for x in np.asarray(ids1).tolist()]
+    seqs2 = [seq_store2.sequence_bytes(x) for x in np.asarray(ids2).tolist()]
+    raw_scores = sw_scores(seqs1, seqs2, workers=workers)
+    return np.where(raw_scores > 0, scoring.bit_scores(raw_scores), 0)
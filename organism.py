@@ -5,7 +5,10 @@ it also includes the BioNet class that stores the relations between two
 Organisms such as their Blast score
 """
 
+import os
+import copy
 import numpy as np
+import networkx as nx
 import scipy.sparse as sparse
 import sklearn.cluster as cluster
 import scipy.sparse.linalg as slnlg
@@ -16,6 +19,20 @@ import visualize
 import constants as cs
 
 
+# graph laplacian D - A of a sparse adjacency as csr
+def laplacian(adj):
+    degree = np.asarray(adj.sum(axis=0)).reshape(-1)
+    return sparse.csr_matrix(sparse.diags(degree) - adj)
+
+
+# arrays of a (tuple) result made read only so cached results stay intact
+def frozen(result):
+    for value in (result if isinstance(result, tuple) else (result,)):
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+    return result
+
+
 class OrgCluster():
     """docstring for OrgCluster"""
 
@@ -51,60 +68,286 @@ class OrgCluster():
 class Organism():
     """docstring for Organism"""
 
-    def __init__(self, nodes_file, edges_file, org_id):
+    def __init__(self, nodes_file, edges_file, org_id, network_file=None,
+                 threshold=cs.INTERACTION_THR):
         self.nodes_file = nodes_file
         self.edges_file = edges_file
+        self.network_file = network_file
         self.org_id = org_id
-        self.file_name = 'organism-{}.bak'.format(org_id)
+        self.snapshot_path = utils.join_path(
+            cs.OBJ_PATH, 'organism-{}.snap'.format(org_id))
 
-        node_data = utils.load_json(nodes_file)
-        self.id_to_node = {ind: node for ind, node in enumerate(node_data)}
-        self.node_to_id = {node: ind for ind, node in enumerate(node_data)}
+        # snapshots are only valid for the sources they were built from
+        self.sources = ([network_file] if network_file is not None
+                        else [nodes_file, edges_file])
 
-        edge_data = utils.load_json(edges_file)
+        if self.load_snapshot(threshold):
+            message = ('{} - Organism loaded from snapshot').format(org_id)
+            utils.print_log(message)
+        else:
+            self.parse_sources(threshold)
+            self.write_snapshot()
+
+            message = ('{} - Organism imported successfully').format(org_id)
+            utils.print_log(message)
+
+        message = ('{} - number of nodes and edges = {}').format(
+            org_id, self.dimensions)
+        utils.print_log(message)
+
+        # visualize.visualise_org_degree(self)
+
+    # read the parsed network (or the old json caches) and apply threshold
+    def parse_sources(self, threshold):
+        if self.network_file is not None:
+            # binary cache, edges are already node indices
+            network = utils.load_npz(self.network_file)
+            node_data = network['nodes']
+            edge_index = network['edges']
+            scores = network['scores']
+        else:
+            node_data = np.array(utils.load_json(self.nodes_file), dtype=str)
+            node_to_id = {node: ind for ind, node in enumerate(node_data)}
+            edge_data = utils.load_json(self.edges_file)
+            edge_index = np.array([(node_to_id[x[0]], node_to_id[x[1]])
+                                   for x in edge_data], dtype=np.int32)
+            scores = np.array([x[2] for x in edge_data], dtype=np.float32)
+
+        # every parsed interaction with its combined score
+        self.all_nodes = node_data
+        self.all_edges = edge_index.reshape(-1, 2)
+        self.all_scores = scores.reshape(-1)
+
+        self.apply_threshold(threshold)
+
+    # write parsed interactions and the thresholded csr topology
+    def write_snapshot(self):
+        utils.write_arrays(self.snapshot_path,
+                           version=np.int64(cs.SNAPSHOT_VERSION),
+                           source_hash=np.array(
+                               utils.files_hash(*self.sources)),
+                           source_stats=utils.files_stats(*self.sources),
+                           threshold=np.float64(self.threshold),
+                           all_nodes=self.all_nodes,
+                           all_edges=self.all_edges,
+                           all_scores=self.all_scores,
+                           node_names=self.node_names,
+                           node_order=self.node_order,
+                           indptr=self.indptr, indices=self.indices,
+                           degree=self.degree,
+                           edge_count=np.int64(self.dimensions[1]))
+
+    # memory map a snapshot of the same version and sources, False if
+    # there is none
+    def load_snapshot(self, threshold):
+        if not os.path.isdir(self.snapshot_path):
+            return False
+
+        arrays = utils.load_arrays(self.snapshot_path)
+        stale = ('version' not in arrays or
+                 int(arrays['version']) != cs.SNAPSHOT_VERSION)
+
+        # sources of unchanged size and mtime are not hashed again
+        stats = utils.files_stats(*self.sources)
+        if not stale and not np.array_equal(arrays.get('source_stats'),
+                                            stats):
+            stale = (str(arrays['source_hash']) !=
+                     utils.files_hash(*self.sources))
+            if not stale:
+                stats_path = utils.join_path(self.snapshot_path,
+                                             'source_stats.npy')
+                utils.write_np(stats, stats_path + '.tmp')
+                os.replace(stats_path + '.tmp', stats_path)
+
+        if stale:
+            message = ('{} - snapshot {} is stale, rebuilding').format(
+                self.org_id, self.snapshot_path)
+            utils.print_log(message)
+            return False
+
+        self.all_nodes = arrays['all_nodes']
+        self.all_edges = arrays['all_edges']
+        self.all_scores = arrays['all_scores']
+
+        # other thresholds reuse the parsed interactions only
+        if float(arrays['threshold']) != threshold:
+            self.apply_threshold(threshold)
+        else:
+            self.threshold = threshold
+            self.set_topology(arrays['node_names'], arrays['node_order'],
+                              arrays['indptr'], arrays['indices'],
+                              arrays['degree'], int(arrays['edge_count']))
+        return True
+
+    # keep interactions scored above threshold and the nodes they touch
+    def apply_threshold(self, threshold):
+        self.threshold = threshold
+
+        kept = self.all_edges[np.asarray(self.all_scores) > threshold]
+        used, edge_index = np.unique(kept, return_inverse=True)
+        edge_index = edge_index.reshape(-1, 2)
+        node_names = np.array(self.all_nodes[used], dtype=str)
+        node_count = len(node_names)
+
+        # symmetric sparse adjacency, edge weights are ignored
+        n1 = edge_index[:, 0]
+        n2 = edge_index[:, 1]
+        rows = np.concatenate([n1, n2])
+        cols = np.concatenate([n2, n1])
+        adjacency = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int8), (rows, cols)),
+            shape=(node_count, node_count))
+        adjacency.sort_indices()
+
+        self.set_topology(node_names,
+                          np.argsort(node_names, kind='stable'),
+                          adjacency.indptr, adjacency.indices,
+                          np.diff(adjacency.indptr).astype(np.float64),
+                          len(edge_index))
+
+    # node tables and adjacency of a thresholded topology in csr form
+    def set_topology(self, node_names, node_order, indptr, indices, degree,
+                     edge_count):
+        # node names and their sorted order for vectorized lookups
+        self.node_names = node_names
+        self.node_order = node_order
 
         # dimensions of Incidence Matrix
-        self.node_count = len(node_data)
+        self.node_count = len(node_names)
         # self.edge_count = len(edge_data)
-        self.dimensions = (len(node_data), len(edge_data))
+        self.dimensions = (len(node_names), edge_count)
 
         # # incidence matrix would be too big -> ignored
         # self.incidence = np.zeros(dimensions)
 
-        self.edges = set()
-        self.adjacency = np.zeros((self.node_count, self.node_count))
-        for index, edge in enumerate(edge_data):
-            n1 = self.node_to_id[edge[0]]
-            n2 = self.node_to_id[edge[1]]
-            self.edges.add((min(n1, n2), max(n1, n2)))
-            # ignore edge weights
-            self.adjacency[n1][n2] = 1
-            self.adjacency[n2][n1] = 1
+        # symmetric sparse adjacency, sorted indices without duplicates
+        self.adjacency = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int8), indices, indptr),
+            shape=(self.node_count, self.node_count))
+        self.adjacency.has_sorted_indices = True
+
+        # neighbors of node i are indices[indptr[i]:indptr[i + 1]]
+        self.indptr = self.adjacency.indptr
+        self.indices = self.adjacency.indices
 
-        self.degree = sum(self.adjacency)
+        self.degree = degree
+
+        # derived properties of the previous topology are stale
+        self._cache = {}
 
         # # P = D^-1 * A
         # self.transition = self.adjacency / self.degree
 
-        message = ('{} - Organism imported successfully').format(org_id)
-        utils.print_log(message)
-
-        message = ('{} - number of nodes and edges = {}').format(
-            org_id, self.dimensions)
+    # node id of each protein name, -1 for proteins not in the network
+    def node_ids(self, names):
+        names = np.array(names, dtype=str)
+        if self.node_count == 0:
+            return np.full(len(names), -1, dtype=np.int64)
+        sorted_names = self.node_names[self.node_order]
+        rows = np.searchsorted(sorted_names, names)
+        rows[rows == self.node_count] = 0
+        return np.where(sorted_names[rows] == names, self.node_order[rows], -1)
+
+    # in memory copy of the organism at another interaction threshold
+    def threshold_view(self, threshold):
+        view = copy.copy(self)
+        view.apply_threshold(threshold)
+
+        message = ('{} - threshold {} view, number of nodes and edges = {}'
+                   ).format(self.org_id, threshold, view.dimensions)
         utils.print_log(message)
 
-        utils.save_object(self, self.file_name)
-
-        # visualize.visualise_org_degree(self)
+        return view
 
+    # neighbor ids of a node, a view of the csr indices (sorted, no copy)
     def neighbors(self, node_id):
-        return [i for i, x in enumerate(self.adjacency[node_id]) if x == 1]
+        return self.indices[self.indptr[node_id]:self.indptr[node_id + 1]]
+
+    # (position in node_ids, neighbor id) of every neighbor of many nodes
+    def neighbors_many(self, node_ids):
+        node_ids = np.asarray(node_ids, dtype=np.int64).reshape(-1)
+        starts = self.indptr[node_ids]
+        counts = self.indptr[node_ids + 1] - starts
+
+        positions = np.repeat(np.arange(len(node_ids)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts)
+        return positions, self.indices[np.repeat(starts, counts) + offsets]
+
+    # set of all neighbors of many nodes
+    def neighbor_set(self, node_ids):
+        return set(np.unique(self.neighbors_many(node_ids)[1]).tolist())
+
+    # float adjacency between rows and cols (by default rows) as sparse csr
+    def sub_adjacency(self, rows, cols=None):
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = rows if cols is None else np.asarray(cols, dtype=np.int64)
+        return self.adjacency[rows, :][:, cols].astype(np.float64)
+
+    # dense adjacency, only for graphs up to limit nodes (None is no limit)
+    def dense_adjacency(self, limit=cs.DENSE_NODE_LIMIT):
+        if limit is not None and self.node_count > limit:
+            raise Exception(('dense adjacency of {} with {} nodes is over '
+                             'the limit of {} nodes').format(
+                self.org_id, self.node_count, limit))
+        return self.adjacency.toarray().astype(np.float64)
+
+    # value of a derived property, computed once per topology
+    def cached(self, name, func):
+        if name not in self._cache:
+            self._cache[name] = func()
+        return self._cache[name]
+
+    # protein name of each node id
+    @property
+    def id_to_node(self):
+        return self.cached('id_to_node', lambda: dict(
+            enumerate(self.node_names.tolist())))
+
+    # node id of each protein name
+    @property
+    def node_to_id(self):
+        return self.cached('node_to_id', lambda: {
+            node: ind for ind, node in enumerate(self.node_names.tolist())})
+
+    # set of (node id, node id) edges, each edge once with the smaller id first
+    @property
+    def edges(self):
+        def build():
+            rows = np.repeat(np.arange(self.node_count), np.diff(self.indptr))
+            upper = rows <= self.indices
+            return set(zip(rows[upper].tolist(),
+                           self.indices[upper].tolist()))
+        return self.cached('edges', build)
 
     def components(self):
         # return components of an organism
-        adj = sparse.csr_matrix(self.adjacency)
-        initial_labels = sparse.csgraph.connected_components(adj)
-        return initial_labels  # n_components, labels
+        return self.cached('components', lambda: frozen(
+            sparse.csgraph.connected_components(self.adjacency)))
+
+    # node ids by ascending degree
+    def degree_order(self):
+        return self.cached('degree_order',
+                           lambda: frozen(self.degree.argsort()))
+
+    # read only networkx graph of all nodes and edges
+    def graph(self):
+        def build():
+            graph = nx.Graph()
+            graph.add_nodes_from(range(self.node_count))
+            graph.add_edges_from(self.edges)
+            return nx.freeze(graph)
+        return self.cached('graph', build)
+
+    # graph laplacian of the whole network
+    def laplacian_matrix(self):
+        return self.cached('laplacian', lambda: laplacian(
+            self.adjacency.astype(np.float64)))
+
+    # betweenness centrality of every node as a dict
+    def betweenness(self):
+        return self.cached('betweenness',
+                           lambda: nx.betweenness_centrality(self.graph()))
 
     def repetetive_devide(self):
         # divide using spectral clustering
@@ -113,9 +356,8 @@ class Organism():
             affinity="precomputed")
 
         # cluster each part to the limit with components as initial clusters
-        adj = sparse.csr_matrix(self.adjacency)
-        initial_labels = sparse.csgraph.connected_components(adj)
-        labels = initial_labels[1]
+        # cached labels are shared, these are changed in place
+        labels = self.components()[1].copy()
         newlabel = max(labels) + 1
 
         # find component size for all labels
@@ -131,7 +373,7 @@ class Organism():
                 if sizes[label] > cs.MAX_CLUSTER_SIZE:
                     selector = np.array(
                         [i for i, x in enumerate(labels) if x == label])
-                    ladj = self.adjacency[selector[:, None], selector]
+                    ladj = self.sub_adjacency(selector)
                     division = divide.fit_predict(ladj)
                     changes = [selector[i]
                                for i, x in enumerate(division) if x == 1]
@@ -152,9 +394,8 @@ class Organism():
         if self.method == 'cclst':
             clustering = cluster.SpectralClustering
 
-        adj = sparse.csr_matrix(self.adjacency)
-        initial_labels = sparse.csgraph.connected_components(adj)
-        labels = initial_labels[1]
+        # cached labels are shared, these are changed in place
+        labels = self.components()[1].copy()
         newlabel = max(labels)
 
         # find component size for all labels
@@ -176,7 +417,7 @@ class Organism():
                         affinity="precomputed")
                     selector = np.array(
                         [i for i, x in enumerate(labels) if x == label])
-                    ladj = self.adjacency[selector[:, None], selector]
+                    ladj = self.sub_adjacency(selector)
                     cclusters = ccluster.fit_predict(ladj)
                     changes = [(selector[i], x)
                                for i, x in enumerate(cclusters) if x != 0]
@@ -194,9 +435,8 @@ class Organism():
 
     def rep_l2_clustering(self):
         # repetetive l2gap clustering
-        adj = sparse.csr_matrix(self.adjacency)
-        initial_labels = sparse.csgraph.connected_components(adj)
-        labels = initial_labels[1]
+        # cached labels are shared, these are changed in place
+        labels = self.components()[1].copy()
         newlabel = max(labels)
 
         # visualization graph
@@ -223,9 +463,8 @@ class Organism():
                     selector = np.array(
                         [i for i, x in enumerate(labels) if x == label])
                     # cluster using l2
-                    ladj = self.adjacency[selector[:, None], selector]
-                    lapl = np.diag(sum(ladj)) - ladj
-                    lapl = sparse.csr_matrix(lapl)
+                    ladj = self.sub_adjacency(selector)
+                    lapl = laplacian(ladj)
                     # eValue, eVector = np.linalg.eig(lapl)
                     eValue, eVector = slnlg.eigs(lapl, k=3, which='SM')
                     idx = eValue.argsort()
@@ -273,9 +512,8 @@ class Organism():
 
     def min_couple_l2(self):
         # repetetive l2gap clustering
-        adj = sparse.csr_matrix(self.adjacency)
-        initial_labels = sparse.csgraph.connected_components(adj)
-        labels = initial_labels[1]
+        # cached labels are shared, these are changed in place
+        labels = self.components()[1].copy()
         newlabel = max(labels)
 
         # visualization graph
@@ -300,9 +538,8 @@ class Organism():
                     selector = np.array(
                         [i for i, x in enumerate(labels) if x == label])
                     # cluster using l2
-                    ladj = self.adjacency[selector[:, None], selector]
-                    lapl = np.diag(sum(ladj)) - ladj
-                    lapl = sparse.csr_matrix(lapl)
+                    ladj = self.sub_adjacency(selector)
+                    lapl = laplacian(ladj)
                     # eValue, eVector = np.linalg.eig(lapl)
                     eValue, eVector = slnlg.eigs(lapl, k=3, which='SM')
                     idx = eValue.argsort()
@@ -371,9 +608,8 @@ class Organism():
 
     def max_cut_l2(self):
         # repetetive l2gap clustering
-        adj = sparse.csr_matrix(self.adjacency)
-        initial_labels = sparse.csgraph.connected_components(adj)
-        labels = initial_labels[1]
+        # cached labels are shared, these are changed in place
+        labels = self.components()[1].copy()
         newlabel = max(labels)
 
         # visualization graph
@@ -398,9 +634,8 @@ class Organism():
                     selector = np.array(
                         [i for i, x in enumerate(labels) if x == label])
                     # cluster using l2
-                    ladj = self.adjacency[selector[:, None], selector]
-                    lapl = np.diag(sum(ladj)) - ladj
-                    lapl = sparse.csr_matrix(lapl)
+                    ladj = self.sub_adjacency(selector)
+                    lapl = laplacian(ladj)
                     # eValue, eVector = np.linalg.eig(lapl)
                     eValue, eVector = slnlg.eigs(lapl, k=3, which='SM')
                     idx = eValue.argsort()
@@ -469,9 +704,8 @@ class Organism():
 
     def max_brutecut_l2(self):
         # repetetive l2gap clustering
-        adj = sparse.csr_matrix(self.adjacency)
-        initial_labels = sparse.csgraph.connected_components(adj)
-        labels = initial_labels[1]
+        # cached labels are shared, these are changed in place
+        labels = self.components()[1].copy()
         newlabel = max(labels)
 
         # visualization graph
@@ -496,9 +730,8 @@ class Organism():
                     selector = np.array(
                         [i for i, x in enumerate(labels) if x == label])
                     # cluster using l2
-                    ladj = self.adjacency[selector[:, None], selector]
-                    lapl = np.diag(sum(ladj)) - ladj
-                    lapl = sparse.csr_matrix(lapl)
+                    ladj = self.sub_adjacency(selector)
+                    lapl = laplacian(ladj)
                     # eValue, eVector = np.linalg.eig(lapl)
                     eValue, eVector = slnlg.eigs(lapl, k=3, which='SM')
                     idx = eValue.argsort()
@@ -571,7 +804,7 @@ class Organism():
                 eigen_solver='arpack',
                 affinity="precomputed")
             labels = clustering.fit_predict(
-                self.adjacency +
+                self.dense_adjacency() +
                 (cs.NOISE_STRENGTH *
                     np.random.rand(self.node_count,
                                    self.node_count)))
@@ -631,6 +864,16 @@ class BioNet():
         if similarity_mode in ['blast_power', 'just_power']:
             self.alpha_rec = '-<alpha={}>'.format(power_alpha)
 
+        # sketch scores of other sketch or local alignment settings differ
+        if similarity_mode in ['kmer_sketch', 'kmer_sw']:
+            self.alpha_rec = ('-<k={},bins={},rows={},'
+                              'mb={},sim={},seed={}>').format(
+                cs.SKETCH_K, cs.SKETCH_BINS, cs.SKETCH_BAND_ROWS,
+                cs.SKETCH_MAX_BUCKET, cs.SKETCH_MIN_SIM, cs.SKETCH_SEED)
+        if similarity_mode == 'kmer_sw':
+            self.alpha_rec += '+<go={},ge={}>'.format(
+                cs.SW_GAP_OPEN, cs.SW_GAP_EXTEND)
+
         file_name = '{}-{}-{}{}_raw_scores.npy'.format(
             org1.org_id, org2.org_id, similarity_mode, self.alpha_rec)
         self.raw_np_file = utils.join_path(cs.NP_PATH, file_name)
@@ -672,6 +915,9 @@ class BioNet():
                 self.calculate_power_method(power_alpha, self.np_file)
                 self.similarity = self.power_met_sim
                 self.store_similarity_matrix(self.np_file)
+            elif similarity_mode in ['kmer_sketch', 'kmer_sw']:
+                self.similarity = self.blast_sim_n
+                self.store_similarity_matrix()
             elif similarity_mode == 'no_sim':
                 self.generate_dummy_matrix()
                 self.similarity = self.dummy_sim
@@ -698,8 +944,13 @@ class BioNet():
     # calculate the normalized blast matrix from blast scores
     @utils.time_it
     def calculate_blast_matrix(self):
-        # blast similarity measure
-        self.blast_sim = interface.blast_xml_to_matrix(self)
+        # blast similarity measure, estimated from k-mer sketches without
+        # blastp in sketch modes, kmer_sw rescores them by local alignment
+        if self.similarity_mode in ['kmer_sketch', 'kmer_sw']:
+            self.blast_sim = interface.sketch_to_matrix(
+                self, rescore=self.similarity_mode == 'kmer_sw')
+        else:
+            self.blast_sim = interface.blast_xml_to_matrix(self)
 
         # normalize blast matrix
         self.blast_sim_n = utils.normalize(self.blast_sim)
@@ -707,6 +958,21 @@ class BioNet():
     # calculate the normalized relative blast matrix from blast scores
     @utils.time_it
     def calculate_rel_blast_matrix(self):
+        # sketch similarities are kept apart from the blast ones
+        if self.similarity_mode in ['kmer_sketch', 'kmer_sw']:
+            if os.path.exists(self.raw_np_file):
+                self.blast_sim = utils.load_np(self.raw_np_file)
+                self.blast_sim_n = utils.normalize(self.blast_sim)
+            else:
+                self.calculate_blast_matrix()
+
+            # sketch jaccard is relative already (1 for identical sequences)
+            if self.similarity_mode == 'kmer_sketch':
+                self.blast_sim_n_rel = self.blast_sim_n
+            else:
+                self.blast_sim_n_rel = self.relative_blast(self.blast_sim)
+            return
+
         file_name = '{}-{}-{}_scores.npy'.format(
             self.org1.org_id, self.org2.org_id, 'rel_blast')
 
@@ -720,27 +986,31 @@ class BioNet():
 
         else:
             # blast similarity measure
-            blast_sim = interface.blast_xml_to_matrix(self)
-            self.blast_sim = blast_sim
+            self.blast_sim = interface.blast_xml_to_matrix(self)
+            self.blast_sim_n_rel = self.relative_blast(self.blast_sim)
+
+            np_file = utils.join_path(cs.NP_PATH, file_name)
+            utils.write_np(self.blast_sim_n_rel, np_file)
 
-            blast_1 = interface.self_blast_xml_to_vec(self.org1)
-            blast_1[blast_1 == 0] = 1
-            blast_1 = np.array([blast_1]).repeat(self.org2.node_count,
-                                                 axis=0).T
+    # normalized bitscores relative to the self hit scores of both proteins
+    def relative_blast(self, blast_sim):
+        # self hit scores without all-vs-all self blast searches
+        blast_1 = interface.self_score_vec(self.org1)
+        blast_1[blast_1 == 0] = 1
+        blast_1 = np.array([blast_1]).repeat(self.org2.node_count,
+                                             axis=0).T
 
-            blast_2 = interface.self_blast_xml_to_vec(self.org2)
-            blast_2[blast_2 == 0] = 1
-            blast_2 = np.array([blast_2]).repeat(self.org1.node_count, axis=0)
+        blast_2 = interface.self_score_vec(self.org2)
+        blast_2[blast_2 == 0] = 1
+        blast_2 = np.array([blast_2]).repeat(self.org1.node_count, axis=0)
 
-            blast_sim = blast_sim.reshape(self.org1.node_count,
-                                          self.org2.node_count)
-            blast_sim = blast_sim / np.power((blast_1 * blast_2), 0.5)
-            blast_sim = blast_sim.reshape(self.dim_sim)
+        blast_sim = blast_sim.reshape(self.org1.node_count,
+                                      self.org2.node_count)
+        blast_sim = blast_sim / np.power((blast_1 * blast_2), 0.5)
+        blast_sim = blast_sim.reshape(self.dim_sim)
 
-            # normalize blast matrix
-            self.blast_sim_n_rel = utils.normalize(blast_sim)
-            np_file = utils.join_path(cs.NP_PATH, file_name)
-            utils.write_np(self.blast_sim_n_rel, np_file)
+        # normalize blast matrix
+        return utils.normalize(blast_sim)
 
     @utils.time_it
     def calculate_power_method(self, alpha, np_file):
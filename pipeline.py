@@ -0,0 +1,164 @@
+"""
+this module contains Pipeline class, a small dependency aware executor for
+preprocessing steps. steps name the steps they require and the files they
+read and write, independent steps run concurrently on a thread pool, steps
+with up to date outputs are skipped and the critical path is reported
+"""
+
+import concurrent.futures as futures
+
+import utils
+import constants as cs
+
+
+class Step():
+    """docstring for Step"""
+
+    def __init__(self, name, func, args=(), requires=(), inputs=(),
+                 outputs=()):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.requires = list(requires)
+
+        # files read and written, the step is skipped if outputs are newer
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+        self.result = None
+        self.skipped = False
+        self.start = self.end = None
+
+    # outputs exist and are not older than any existing input
+    def up_to_date(self):
+        return bool(self.outputs) and all(
+            [utils.up_to_date(x, *self.inputs) for x in self.outputs])
+
+    def run(self):
+        self.start = utils.time_str('raw')
+        self.result = self.func(*self.args)
+        self.end = utils.time_str('raw')
+        return self.result
+
+    def duration(self):
+        return 0 if self.start is None else self.end - self.start
+
+
+class Pipeline():
+    """docstring for Pipeline"""
+
+    def __init__(self, name, workers=cs.PIPELINE_WORKERS):
+        self.name = name
+        self.workers = workers
+        self.steps = {}
+
+    # add a step, steps run after all steps they require
+    def add(self, name, func, args=(), requires=(), inputs=(), outputs=()):
+        if name in self.steps:
+            raise Exception('step {} is already in {}'.format(name,
+                                                               self.name))
+        self.steps[name] = Step(name, func, args, requires, inputs, outputs)
+        return name
+
+    # results of the steps that ran by step name
+    def results(self):
+        return {x: y.result for x, y in self.steps.items()}
+
+    # steps in an order that respects their requirements
+    def order(self):
+        for step in self.steps.values():
+            missing = [x for x in step.requires if x not in self.steps]
+            if missing:
+                raise Exception('step {} requires unknown steps {}'.format(
+                    step.name, missing))
+
+        order, done = [], set()
+        while len(order) < len(self.steps):
+            ready = [x for x, y in self.steps.items() if x not in done and
+                     all([z in done for z in y.requires])]
+            if not ready:
+                raise Exception('steps of {} have circular requirements'
+                                .format(self.name))
+            order += ready
+            done.update(ready)
+        return order
+
+    # run all steps, each as soon as its requirements finished
+    @utils.time_it
+    def run(self):
+        pending = self.order()
+        done = set()
+        start = utils.time_str('raw')
+
+        with futures.ThreadPoolExecutor(max(1, self.workers)) as pool:
+            running = {}
+            while pending or running:
+                for name in [x for x in pending if
+                             all([y in done for y in self.steps[x].requires])]:
+                    pending.remove(name)
+                    step = self.steps[name]
+
+                    if step.up_to_date():
+                        message = '{}: {} is up to date'.format(self.name,
+                                                                name)
+                        utils.print_log(message)
+                        step.skipped = True
+                        done.add(name)
+                    else:
+                        running[pool.submit(step.run)] = name
+
+                # skipped steps may have made other steps ready
+                if not running:
+                    continue
+
+                finished = futures.wait(
+                    running, return_when=futures.FIRST_COMPLETED)[0]
+                for future in finished:
+                    # errors of a step stop the pipeline
+                    future.result()
+                    done.add(running.pop(future))
+
+        self.report(utils.time_str('raw') - start)
+        return self.results()
+
+    # (step names, seconds) of the longest chain of required steps
+    def critical_path(self):
+        finish, previous = {}, {}
+        for name in self.order():
+            step = self.steps[name]
+            before = max(step.requires, key=lambda x: finish[x],
+                         default=None)
+            previous[name] = before
+            finish[name] = step.duration() + (finish[before] if before
+                                                else 0)
+
+        name = max(finish, key=lambda x: finish[x], default=None)
+        total = finish.get(name, 0)
+        path = []
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return path[::-1], total
+
+    # timing breakdown of the last run along its critical path
+    def report(self, wall_time):
+        path, total = self.critical_path()
+        busy = sum([x.duration() for x in self.steps.values()])
+
+        message = ('{}: {} steps ({} skipped) in {}, {} of step time, '
+                   'critical path {}').format(
+            self.name, len(self.steps),
+            sum([x.skipped for x in self.steps.values()]),
+            time_delta(wall_time), time_delta(busy), time_delta(total))
+        utils.print_log(message)
+
+        for name in path:
+            step = self.steps[name]
+            message = '{}:   {} {}'.format(
+                self.name, name,
+                'skipped' if step.skipped else time_delta(step.duration()))
+            utils.print_log(message)
+
+
+def time_delta(seconds):
+    return '{:.2f}s'.format(seconds)
@@ -9,6 +9,7 @@ import argparse
 import gc
 
 import utils
+import pipeline
 import string_db
 import interface
 import organism
@@ -45,7 +46,15 @@ algorithms = ['CGRAAL', 'MIGRAAL', 'NETAL', 'HubAlign', 'PROPER',
 
 
 similarity_modes = ['raw_blast', 'blast_power', 'just_power', 'no_sim',
-                    'rel_blast']
+                    'rel_blast', 'kmer_sketch', 'kmer_sw']
+
+# similarity modes computed without blastp
+blast_free_modes = ['kmer_sketch', 'kmer_sw']
+
+# aligners that read blastp hits themselves instead of the similarity
+blast_hit_methods = ['isoN', 'NETAL', 'pinalog', 'CGRAAL', 'GRAAL', 'MIGRAAL',
+                     'HubAlign', 'PROPER', 'SPINAL-I', 'SPINAL-II', 'optnet',
+                     'moduleAlign']
 
 
 # function to initialize network
@@ -56,23 +65,63 @@ def initialize_network(organism_ids, align_method, similarity_mode,
     # sort ids to fix order
     organism_ids.sort()
 
-    # check if initial files exist
-    list(map(string_db.check_initial_files, organism_ids))
-
-    # create blast db for organisms
-    list(map(interface.create_blast_db, organism_ids))
-
     # print('\n\n\n!!!\n\n\n')
     print(organism_ids)
 
-    # run blastp scores if needed
-    interface.run_blast_prot(*organism_ids)
-    # if (align_method in ['isoN', 'NETAL']) or (similarity_mode == 'rel_blast'):
-    for x in organism_ids:
-        interface.run_blast_prot(x, x)
-
-    # parse organism ppi networks from input
-    org1, org2 = map(string_db.parse_organism, organism_ids)
+    # independent preprocessing steps run concurrently
+    steps = pipeline.Pipeline('initialize_network')
+    multi_ppi = utils.file_exists(string_db.input_file(cs.PPI_FILE), '')
+
+    for org in organism_ids:
+        # check if initial files exist
+        steps.add('check-' + org, string_db.check_initial_files, (org,))
+
+        # the sequence store is shared by the blast and sketch steps
+        seq_file = utils.join_path(
+            cs.STRING_PATH, '{}.protein.sequences.v10.5.fa'.format(org))
+        steps.add('sequences-' + org, string_db.parse_organism_seq, (org,),
+                  requires=['check-' + org],
+                  inputs=[seq_file, seq_file + '.gz'],
+                  outputs=[utils.join_path(
+                      cs.JSON_PATH, '{}_parsed_sequences.store'.format(org))])
+
+        # parse organism ppi networks from their own links files
+        if not multi_ppi:
+            steps.add('network-' + org, string_db.parse_organism, (org,),
+                      requires=['check-' + org])
+
+    # the full links file is read once for all organisms
+    if multi_ppi:
+        steps.add('networks', string_db.parse_organisms, (organism_ids,),
+                  requires=['check-' + x for x in organism_ids])
+
+    # sketch similarity skips blastp unless the aligner reads blast hits
+    if (similarity_mode not in blast_free_modes or
+            align_method in blast_hit_methods):
+        # run blastp scores if needed, all searches share the core budget
+        # only isorankN and NETAL read self hits, rel_blast uses self scores
+        org_pairs = [tuple(organism_ids)]
+        if align_method in ['isoN', 'NETAL']:
+            org_pairs += [(x, x) for x in organism_ids]
+
+        # several pairs are searched at once against a combined blast db
+        if cs.BLAST_GRID and len(org_pairs) > 1:
+            steps.add('blast', interface.run_blast_grid,
+                      (organism_ids, org_pairs),
+                      requires=['sequences-' + x for x in organism_ids])
+        else:
+            # create blast db for organisms
+            for org in organism_ids:
+                steps.add('db-' + org, interface.create_blast_db, (org,),
+                          requires=['sequences-' + org])
+            steps.add('blast', interface.run_blast_prots, (org_pairs,),
+                      requires=['db-' + x for x in organism_ids])
+
+    results = steps.run()
+    if multi_ppi:
+        org1, org2 = results['networks']
+    else:
+        org1, org2 = [results['network-' + x] for x in organism_ids]
 
     # create bio_net object with propper options
     bio_net = organism.BioNet(org1, org2, similarity_mode, power_alpha)
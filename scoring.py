@@ -0,0 +1,62 @@
+"""
+this module contains protein sequence scoring helpers, such as the BLOSUM62
+lookup table over sequence bytes, raw to bit score conversion and the self
+alignment scores used to normalize blast scores
+"""
+
+import math
+import numpy as np
+
+import constants as cs
+
+
+# substitution matrix as a 256 x 256 table indexed by sequence bytes,
+# residues outside the alphabet score as X
+def substitution_table(matrix=cs.BLOSUM62, alphabet=cs.BLOSUM62_ALPHABET):
+    codes = np.full(256, alphabet.index('X'))
+    for index, residue in enumerate(alphabet):
+        codes[ord(residue)] = index
+        codes[ord(residue.lower())] = index
+
+    matrix = np.array(matrix, dtype=np.int32)
+    return matrix[codes[:, None], codes[None, :]]
+
+
+# convert raw alignment scores to bit scores
+def bit_scores(raw_scores, lambda_=cs.BLAST_LAMBDA, k=cs.BLAST_K):
+    return (lambda_ * np.asarray(raw_scores, dtype=np.float64) -
+            math.log(k)) / math.log(2)
+
+
+# best local alignment score of every store sequence against itself
+def self_scores(seq_store, table=None):
+    if table is None:
+        table = substitution_table()
+
+    residues = np.diagonal(table)[np.asarray(seq_store.blob)]
+    scores = np.zeros(len(seq_store), dtype=np.int64)
+
+    # sequences are contiguous in the blob, empty ones are skipped
+    present = np.flatnonzero(np.asarray(seq_store.lengths) > 0)
+    if len(present) == 0:
+        return scores
+    starts = np.asarray(seq_store.offsets)[present]
+    scores[present] = np.add.reduceat(residues, starts)
+
+    # a negative residue (X, unknown) may cut the diagonal local alignment
+    negatives = np.add.reduceat((residues < 0).astype(np.int64), starts)
+    for index in present[negatives > 0].tolist():
+        start = seq_store.offsets[index]
+        scores[index] = max_subarray(
+            residues[start:start + seq_store.lengths[index]])
+
+    return scores
+
+
+# maximum sum of a contiguous part of values (kadane)
+def max_subarray(values):
+    best = current = 0
+    for value in values.tolist():
+        current = max(0, current + value)
+        best = max(best, current)
+    return best
@@ -0,0 +1,186 @@
+"""
+this module contains SequenceStore class, an indexed protein sequence store.
+sequences are kept in one byte blob with an offsets table (like a fasta .fai
+index) so any protein is read from the memory mapped blob without loading
+the others
+"""
+
+import hashlib
+import numpy as np
+
+import utils
+
+
+class SequenceStore():
+    """docstring for SequenceStore"""
+
+    def __init__(self, store_path, mmap_mode='r'):
+        self.store_path = store_path
+        arrays = utils.load_arrays(store_path, mmap_mode=mmap_mode)
+
+        # protein names in fasta order and their byte ranges in the blob
+        self.names = arrays['names']
+        self.offsets = arrays['offsets']
+        self.lengths = arrays['lengths']
+        self.blob = arrays['blob']
+
+        # name positions sorted by name for vectorized lookups
+        self.order = arrays['order']
+        self._index = None
+        self._hashes = None
+        self._groups = None
+
+    # parse a (gzip compressed) fasta file into a store
+    @staticmethod
+    def build(store_path, fasta_path):
+        names = []
+        sequences = []
+        chunks = None
+
+        with utils.open_file(fasta_path, 'rb') as infile:
+            for line in infile:
+                line = line.strip()
+                if line.startswith(b'>'):
+                    chunks = []
+                    names.append(line[1:].split()[0].decode())
+                    sequences.append(chunks)
+                elif line and chunks is not None:
+                    chunks.append(line)
+
+        sequences = [b''.join(x) for x in sequences]
+        lengths = np.array([len(x) for x in sequences], dtype=np.int64)
+        offsets = np.zeros(len(sequences), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=offsets[1:])
+
+        names = np.array(names, dtype=str)
+        utils.write_arrays(store_path, names=names, offsets=offsets,
+                           lengths=lengths,
+                           blob=np.frombuffer(b''.join(sequences),
+                                              dtype=np.uint8),
+                           order=np.argsort(names, kind='stable'))
+
+        return SequenceStore(store_path)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    # sequence of a protein name
+    def __getitem__(self, name):
+        return self.sequence(self.index[name])
+
+    # all (name, sequence) pairs in fasta order
+    def __iter__(self):
+        for i, name in enumerate(self.names.tolist()):
+            yield name, self.sequence(i)
+
+    # protein name -> position dict, built on first use
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {x: i for i, x in enumerate(self.names.tolist())}
+        return self._index
+
+    def get(self, name, default=None):
+        i = self.index.get(name)
+        return default if i is None else self.sequence(i)
+
+    # position of each name in the store, -1 for unknown names
+    def ids(self, names):
+        names = np.array(names, dtype=str)
+        if len(self.names) == 0:
+            return np.full(len(names), -1, dtype=np.int64)
+        sorted_names = self.names[self.order]
+        rows = np.searchsorted(sorted_names, names)
+        rows[rows == len(self.names)] = 0
+        return np.where(sorted_names[rows] == names, self.order[rows], -1)
+
+    # 64 bit content hash of every sequence, equal sequences hash equally
+    def hashes(self):
+        if self._hashes is None:
+            self._hashes = np.array(
+                [int.from_bytes(hashlib.blake2b(
+                    self.sequence_bytes(i), digest_size=8).digest(), 'little')
+                 for i in range(len(self.names))], dtype=np.uint64)
+        return self._hashes
+
+    # mask of proteins that are new or whose sequence differs from an
+    # earlier (names, hashes) snapshot
+    def changed(self, names, hashes):
+        old_hashes = dict(zip(np.asarray(names).tolist(),
+                              np.asarray(hashes).tolist()))
+        return np.array([old_hashes.get(x) != y for x, y in
+                         zip(self.names.tolist(), self.hashes().tolist())],
+                        dtype=bool)
+
+    # identical sequence groups as (group of each position, members of
+    # group g at members[indptr[g]:indptr[g + 1]] in fasta order)
+    def duplicate_groups(self):
+        if self._groups is None:
+            hashes, first, groups = np.unique(
+                self.hashes(), return_index=True, return_inverse=True)
+
+            # groups are numbered in the order of their first member
+            rank = np.empty(len(first), dtype=np.int64)
+            rank[np.argsort(first, kind='stable')] = np.arange(len(first))
+            groups = rank[groups.reshape(-1)]
+
+            members = np.argsort(groups, kind='stable')
+            indptr = np.zeros(len(first) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(groups, minlength=len(first)),
+                      out=indptr[1:])
+            self._groups = (groups, members, indptr)
+        return self._groups
+
+    # first protein of every identical sequence group, optionally only
+    # among the positions in ids
+    def representatives(self, ids=None):
+        groups = self.duplicate_groups()[0]
+        if ids is None:
+            ids = np.arange(len(self.names))
+        ids = np.asarray(ids, dtype=np.int64)
+        first = np.unique(groups[ids], return_index=True)[1]
+        return np.sort(ids[first])
+
+    # (position in ids, member position) for every protein with the same
+    # sequence as ids[i], unknown ids (-1) have no members
+    def members(self, ids):
+        groups, members, indptr = self.duplicate_groups()
+        ids = np.asarray(ids, dtype=np.int64)
+        known = np.flatnonzero(ids >= 0)
+        group_ids = groups[ids[known]]
+        counts = indptr[group_ids + 1] - indptr[group_ids]
+
+        positions = np.repeat(known, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts)
+        return positions, members[np.repeat(indptr[group_ids], counts) +
+                                  offsets]
+
+    # sequence bytes of a position
+    def sequence_bytes(self, i):
+        start = self.offsets[i]
+        return self.blob[start:start + self.lengths[i]].tobytes()
+
+    def sequence(self, i):
+        return self.sequence_bytes(i).decode()
+
+    # fasta bytes of some (by default all) proteins
+    def fasta_bytes(self, ids=None, width=60):
+        if ids is None:
+            ids = range(len(self.names))
+
+        lines = []
+        for i in ids:
+            seq = self.sequence_bytes(i)
+            lines.append(b'>' + self.names[i].encode() + b'\n')
+            for start in range(0, len(seq), width):
+                lines.append(seq[start:start + width] + b'\n')
+        return b''.join(lines)
+
+    # write some (by default all) proteins as fasta
+    def write_fasta(self, file_path, ids=None, width=60):
+        with open(file_path, 'wb') as outfile:
+            outfile.write(self.fasta_bytes(ids, width))
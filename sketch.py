@@ -0,0 +1,133 @@
+"""
+this module contains k-mer minhash sketches of protein sequences. every
+sequence gets a one permutation minhash signature computed over the whole
+sequence store blob at once, candidate pairs are found by banded locality
+sensitive hashing and scored by their estimated k-mer jaccard similarity
+"""
+
+import numpy as np
+import scipy.sparse as sparse
+
+import constants as cs
+
+# signature value of bins without any k-mer
+EMPTY = np.iinfo(np.uint64).max
+
+
+# (sequence position, k-mer code) of every k-mer of the store sequences
+def kmer_codes(seq_store, k=cs.SKETCH_K, alphabet=cs.SKETCH_ALPHABET):
+    lookup = np.full(256, -1, dtype=np.int64)
+    for index, residue in enumerate(alphabet):
+        lookup[ord(residue)] = index
+        lookup[ord(residue.lower())] = index
+
+    residues = lookup[np.asarray(seq_store.blob)]
+    count = len(residues) - k + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    codes = np.zeros(count, dtype=np.int64)
+    valid = np.ones(count, dtype=bool)
+    for shift in range(k):
+        part = residues[shift:shift + count]
+        codes = codes * len(alphabet) + part
+        valid &= part >= 0
+
+    # k-mers may not run into the next sequence of the blob
+    owner = np.repeat(np.arange(len(seq_store)),
+                      np.asarray(seq_store.lengths))
+    valid &= owner[:count] == owner[k - 1:]
+
+    return owner[:count][valid], codes[valid]
+
+
+# 64 bit mix (splitmix64) of integer codes
+def hash_codes(codes, seed=cs.SKETCH_SEED):
+    h = np.asarray(codes).astype(np.uint64)
+    h += np.uint64((seed + 1) * 0x9E3779B97F4A7C15 % 2**64)
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+# one permutation minhash signature of every store sequence, bins without
+# k-mers (short sequences) are EMPTY
+def signatures(seq_store, k=cs.SKETCH_K, bins=cs.SKETCH_BINS,
+               seed=cs.SKETCH_SEED):
+    owner, codes = kmer_codes(seq_store, k)
+    hashes = hash_codes(codes, seed)
+
+    sig = np.full(len(seq_store) * bins, EMPTY, dtype=np.uint64)
+    np.minimum.at(sig, owner * bins + (hashes % np.uint64(bins)).astype(
+        np.int64), hashes // np.uint64(bins))
+    return sig.reshape(len(seq_store), bins)
+
+
+# lsh key of every band of rows bins and whether the band has no EMPTY bin
+def band_keys(sig, rows=cs.SKETCH_BAND_ROWS, seed=cs.SKETCH_SEED):
+    bands = sig.shape[1] // rows
+    sig = sig[:, :bands * rows].reshape(len(sig), bands, rows)
+    weights = hash_codes(np.arange(rows), seed + 1) | np.uint64(1)
+
+    keys = hash_codes((sig * weights).sum(axis=2, dtype=np.uint64), seed)
+    return keys, (sig != EMPTY).all(axis=2)
+
+
+# sequence pairs sharing at least one lsh band as (ids1, ids2)
+def candidate_pairs(sig1, sig2, rows=cs.SKETCH_BAND_ROWS,
+                    max_bucket=cs.SKETCH_MAX_BUCKET):
+    keys1, valid1 = band_keys(sig1, rows)
+    keys2, valid2 = band_keys(sig2, rows)
+    codes = []
+
+    for band in range(keys1.shape[1]):
+        ids1 = np.flatnonzero(valid1[:, band])
+        ids2 = np.flatnonzero(valid2[:, band])
+        band1 = keys1[ids1, band]
+        order = np.argsort(keys2[ids2, band], kind='stable')
+        band2 = keys2[ids2[order], band]
+
+        # bucket members of the other organism, crowded buckets are skipped
+        left = np.searchsorted(band2, band1, 'left')
+        counts = np.searchsorted(band2, band1, 'right') - left
+        inverse, sizes = np.unique(band1, return_inverse=True,
+                                   return_counts=True)[1:]
+        counts[(counts > max_bucket) |
+               (sizes[inverse.reshape(-1)] > max_bucket)] = 0
+
+        positions = np.repeat(np.arange(len(ids1)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts)
+        codes.append(ids1[positions] * len(sig2) +
+                     ids2[order[np.repeat(left, counts) + offsets]])
+
+    codes = np.unique(np.concatenate(codes)) if codes else np.zeros(
+        0, dtype=np.int64)
+    return codes // len(sig2), codes % len(sig2)
+
+
+# estimated k-mer jaccard similarity of sig1[ids1[i]] and sig2[ids2[i]]
+def estimate_jaccard(sig1, sig2, ids1, ids2, chunk_size=2**16):
+    scores = np.zeros(len(ids1))
+    for start in range(0, len(ids1), chunk_size):
+        part1 = sig1[ids1[start:start + chunk_size]]
+        part2 = sig2[ids2[start:start + chunk_size]]
+        empty1 = part1 == EMPTY
+        empty2 = part2 == EMPTY
+
+        matches = ((part1 == part2) & ~empty1).sum(axis=1)
+        filled = (~(empty1 & empty2)).sum(axis=1)
+        scores[start:start + chunk_size] = matches / np.maximum(filled, 1)
+    return scores
+
+
+# sparse (sequences1 x sequences2) estimated jaccard similarity of lsh
+# candidate pairs
+def similarity(sig1, sig2, rows=cs.SKETCH_BAND_ROWS,
+               min_sim=cs.SKETCH_MIN_SIM, max_bucket=cs.SKETCH_MAX_BUCKET):
+    ids1, ids2 = candidate_pairs(sig1, sig2, rows, max_bucket)
+    scores = estimate_jaccard(sig1, sig2, ids1, ids2)
+
+    keep = scores >= min_sim
+    return sparse.csr_matrix((scores[keep], (ids1[keep], ids2[keep])),
+                             shape=(len(sig1), len(sig2)))
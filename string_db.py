@@ -3,101 +3,354 @@ this module contains codes that are responsible to read and parse information
 from the string db data source
 """
 
+import os
+import itertools
+import threading
+import numpy as np
+
 import utils
 import organism
+import sequence
+import annotation
 import constants as cs
 
 
+# use the gzip compressed version of an input file if only that is present
+def input_file(file_path):
+    if not os.path.isfile(file_path) and os.path.isfile(file_path + '.gz'):
+        return file_path + '.gz'
+    return file_path
+
+
+# organism id of a line in string db ppi files
+def ppi_line_org(line):
+    return line[:line.find(b'.')] if b'.' in line else b''
+
+
+# organism id of a line in string db GO files
+def go_line_org(line):
+    return line[:line.find(b'\t')] if b'\t' in line else b''
+
+
+# build the byte ranges of every organism in a string db file
+@utils.time_it
+def build_offset_index(file_path, key_func):
+    message = 'building byte offset index for {}'.format(file_path)
+    utils.print_log(message)
+
+    ranges = {}
+    last_key = None
+    offset = 0
+    with utils.open_file(file_path, 'rb') as infile:
+        for line in infile:
+            key = key_func(line)
+            if key != last_key:
+                ranges.setdefault(key.decode(), []).append([offset, offset])
+                last_key = key
+            offset += len(line)
+            ranges[key.decode()][-1][1] = offset
+
+    stat = os.stat(file_path)
+    index = {'size': stat.st_size, 'mtime': stat.st_mtime, 'ranges': ranges}
+    utils.write_json(index, file_path + cs.INDEX_SUFFIX)
+
+    return index
+
+
+# load the sidecar offset index of a file, rebuild it if outdated
+def load_offset_index(file_path, key_func):
+    index_path = file_path + cs.INDEX_SUFFIX
+
+    if utils.file_exists(index_path, ''):
+        index = utils.load_json(index_path)
+        stat = os.stat(file_path)
+        if (index['size'] == stat.st_size and
+                index['mtime'] == stat.st_mtime):
+            return index
+
+    return build_offset_index(file_path, key_func)
+
+
+# iterate over the lines of one organism using the offset index
+def organism_lines(file_path, org, key_func):
+    index = load_offset_index(file_path, key_func)
+
+    # gzip inputs only seek forward, by decompressing without parsing
+    with utils.open_file(file_path, 'rb') as infile:
+        for start, end in index['ranges'].get(org, []):
+            infile.seek(start)
+            offset = start
+            while offset < end:
+                line = infile.readline()
+                offset += len(line)
+                yield line.decode()
+
+
+# parse newline aligned chunks of a file with a pool of workers
+def parse_chunks(record_func, file_path, ranges, workers=cs.PARSE_WORKERS):
+    chunks = []
+    for start, end in ranges:
+        chunks += utils.file_chunks(file_path, start, end,
+                                    cs.PARSE_CHUNK_SIZE)
+
+    message = 'parsing {} in {} chunks with {} workers'.format(
+        file_path, len(chunks), workers)
+    utils.print_log(message)
+
+    # chunk results are merged in file order
+    results = utils.parallel_map(
+        parse_chunk, [(record_func, file_path, x, y) for x, y in chunks],
+        workers)
+
+    return list(itertools.chain(*results))
+
+
+def parse_chunk(args):
+    record_func, file_path, start, end = args
+    records = map(record_func, utils.read_chunk_lines(file_path, start, end))
+    return [x for x in records if x is not None]
+
+
+# interaction record of a string db ppi line, all scores are kept
+def ppi_record(line):
+    words = line.split()
+    prot1 = words[0]
+    prot2 = words[1]
+    score = words[2]
+    return (prot1, prot2, score)
+
+
+# annotation record of a single organism GO line
+def go_record(line):
+    words = line.strip().split('\t')
+    prot = words[0]
+    go = words[2]
+    evidence = words[5]
+    score = words[6]
+    return (prot, go, evidence, score)
+
+
+# experimental annotation record of a multi organism GO line
+def all_go_record(line):
+    words = line.strip().split('\t')
+    org = words[0]
+    prot = words[1]
+    go = words[3]
+    evidence = words[6]
+    # score = words[7]
+    if evidence in cs.GO_EVIDENCES:
+        return ('{}.{}'.format(org, prot), go)
+
+
 # parse the string db ppi file
 @utils.time_it
-def parse_organism_ppi(org, ppi_path, node_path, edge_path):
-    with open(ppi_path, 'r') as index:
-        # list of all protein codes
-        nodes = set()
+def parse_organism_ppi(org, ppi_path, network_path,
+                       workers=cs.PARSE_WORKERS):
+    # compressed files can not be split into chunks
+    if workers > 1 and not ppi_path.endswith('.gz'):
+        ranges = load_offset_index(ppi_path, ppi_line_org)['ranges']
+        edges = parse_chunks(ppi_record, ppi_path, ranges.get(org, []),
+                             workers)
+
+    else:
         # list of all protein interactions
         edges = []
 
-        while True:
-            line = index.readline()
-            if line == '':
-                break
-            elif line[:(len(org))] != org:
-                continue
-            line = line.strip()
-            words = line.split()
-            prot1 = words[0]
-            prot2 = words[1]
-            score = words[2]
-            if int(score) > cs.INTERACTION_THR:
-                nodes.add(prot1)
-                nodes.add(prot2)
-                edges.append(words)
+        for line in organism_lines(ppi_path, org, ppi_line_org):
+            edges.append(ppi_record(line))
+
+    write_parsed_network(edges, network_path)
+
+
+# store parsed interactions as node table and integer edge arrays
+def write_parsed_network(edges, network_path):
+    prots = np.array([(x[0], x[1]) for x in edges], dtype=str).reshape(-1)
+    nodes, edge_index = np.unique(prots, return_inverse=True)
+    scores = np.array([x[2] for x in edges], dtype=np.float32)
+
+    # every edge is kept, Organism applies the interaction threshold
+    utils.write_npz(network_path, nodes=nodes,
+                    edges=edge_index.reshape(-1, 2).astype(np.int32),
+                    scores=scores, threshold=np.int32(0))
+
+
+# score threshold of the parsed network cache of an organism, None if missing
+def parsed_threshold(org, out_path=cs.JSON_PATH):
+    network_name = '{}_parsed_network.npz'.format(org)
+    file_names = ['{}_parsed_nodes.json'.format(org),
+                  '{}_parsed_edges.json'.format(org)]
 
-        utils.write_json(list(nodes), node_path)
+    if utils.file_exists(network_name, out_path):
+        with np.load(utils.join_path(out_path, network_name)) as network:
+            if 'threshold' in network.files:
+                return int(network['threshold'])
 
-        utils.write_json(edges, edge_path)
+    # older caches were filtered while parsing
+    if (utils.file_exists(network_name, out_path) or
+            utils.files_exist(file_names, out_path)):
+        return cs.INTERACTION_THR
 
+    return None
 
-# parse the string db protein sequences file
+
+# parse the ppi of several organisms from a single string db ppi file
 @utils.time_it
+def parse_organisms_ppi(orgs, ppi_path=cs.PPI_FILE, out_path=cs.JSON_PATH):
+    # edges of every requested organism
+    edges = {org: [] for org in orgs}
+
+    message = 'parsing ppi information of {} in one pass'.format(orgs)
+    utils.print_log(message)
+
+    ppi_path = input_file(ppi_path)
+
+    # bytes read are the file size, or the organism ranges of an index
+    indexed = utils.file_exists(ppi_path + cs.INDEX_SUFFIX, '')
+    byte_count = os.path.getsize(ppi_path)
+    if indexed:
+        ranges = load_offset_index(ppi_path, ppi_line_org)['ranges']
+        byte_count = sum([end - start for org in orgs
+                          for start, end in ranges.get(org, [])])
+
+    line_count = 0
+    start_time = utils.time_str('raw')
+    with utils.open_file(ppi_path, 'r') as index:
+        # seek straight to the organisms if the file is already indexed
+        if indexed:
+            index = itertools.chain(*[
+                organism_lines(ppi_path, org, ppi_line_org) for org in orgs])
+
+        for line in index:
+            line_count += 1
+            if line_count % cs.PPI_REPORT_FREQ == 0:
+                message = 'reached line #{}'.format(line_count)
+                utils.print_log(message, mode='progress')
+
+            # organism id is the prefix of the first protein code
+            org = line[:line.find('.')]
+            if org not in edges:
+                continue
+            edges[org].append(line.split())
+
+    message = 'ppi parsing finished for {}'.format(orgs)
+    utils.print_log(message, mode='end_progress')
+    utils.print_throughput(ppi_path, line_count, byte_count, start_time)
+
+    for org in orgs:
+        network_path = utils.join_path(out_path,
+                                       '{}_parsed_network.npz'.format(org))
+        write_parsed_network(edges[org], network_path)
+
+
+# sequence stores already opened and their locks, keyed by store path
+seq_stores = {}
+seq_store_locks = {}
+seq_store_locks_lock = threading.Lock()
+
+
+# parse the string db protein sequences file, once per sequences release
 def parse_organism_seq(org, in_path=cs.STRING_PATH,
-                       out_path=cs.JSON_PATH):
+                       out_path=cs.JSON_PATH, check=True):
     seq_name = '{}.protein.sequences.v10.5.fa'.format(org)
-    pseq_name = '{}_parsed_sequences.json'.format(org)
+    store_name = '{}_parsed_sequences.store'.format(org)
 
-    seq_path = utils.join_path(in_path, seq_name)
-    pseq_path = utils.join_path(out_path, pseq_name)
+    seq_path = input_file(utils.join_path(in_path, seq_name))
+    store_path = utils.join_path(out_path, store_name)
 
-    with open(seq_path, 'r') as index:
+    # stores of different organisms are opened concurrently
+    with seq_store_locks_lock:
+        lock = seq_store_locks.setdefault(store_path, threading.Lock())
 
-        # list of all protein sequences
-        proteins = []
-        prt = ''
-        seq = ''
+    with lock:
+        source_stats = utils.files_stats(seq_path).tobytes()
+        stats, seq_store = seq_stores.get(store_path, (None, None))
+        if not (check and stats == source_stats):
+            seq_store = load_organism_seq(org, seq_path, store_path, check)
+            seq_stores[store_path] = (source_stats, seq_store)
 
-        while True:
-            line = index.readline()
-            line = line.strip()
-            if line == '':
-                proteins.append({'code': prt, 'sequence': seq})
-                break
-            elif line[0] == '>':
-                proteins.append({'code': prt, 'sequence': seq})
-                prt = line[1:]
-                seq = ''
-            else:
-                seq += line
+    return seq_store
 
-        utils.write_json(proteins, pseq_path)
+
+# open or build the sequence store of a sequences file
+@utils.time_it
+def load_organism_seq(org, seq_path, store_path, check=True):
+    # a new sequences release replaces the store
+    if (check and utils.up_to_date(store_path, seq_path)):
+        message = 'using existing sequence store for {}'.format(org)
+        utils.print_log(message)
+
+        return sequence.SequenceStore(store_path)
+
+    message = 'building sequence store for {}'.format(org)
+    utils.print_log(message)
+
+    return sequence.SequenceStore.build(store_path, seq_path)
 
 
 # parse ppi files if need be
 def parse_organism(org, in_path=cs.STRING_PATH,
-                   out_path=cs.JSON_PATH, check=True):
+                   out_path=cs.JSON_PATH, check=True,
+                   threshold=cs.INTERACTION_THR):
     ppi_name = '{}.protein.links.v10.5.txt'.format(org)
+    network_name = '{}_parsed_network.npz'.format(org)
     node_name = '{}_parsed_nodes.json'.format(org)
     edge_name = '{}_parsed_edges.json'.format(org)
 
-    ppi_path = utils.join_path(in_path, ppi_name)
+    ppi_path = input_file(utils.join_path(in_path, ppi_name))
+    network_path = utils.join_path(out_path, network_name)
     node_path = utils.join_path(out_path, node_name)
     edge_path = utils.join_path(out_path, edge_name)
 
-    if (check and utils.files_exist([node_name, edge_name], out_path)):
+    # caches filtered above the requested threshold miss edges
+    cached = parsed_threshold(org, out_path) if check else None
+    if cached is not None and cached > threshold:
+        message = ('parsed network of {} is filtered at {}, parsing again'
+                   ).format(org, cached)
+        utils.print_log(message)
+        check = False
+
+    if (check and utils.file_exists(network_name, out_path)):
+        message = 'using existing parsed network for {}'.format(org)
+        utils.print_log(message)
+
+    elif (check and utils.files_exist([node_name, edge_name], out_path)):
+        # old caches are still supported
         message = 'using existing parsed jsons for {}'.format(org)
         utils.print_log(message)
+        network_path = None
 
     else:
         message = ('parsing ppi information of {}').format(org)
         utils.print_log(message)
 
-        parse_organism_ppi(org, ppi_path, node_path, edge_path)
+        parse_organism_ppi(org, ppi_path, network_path)
 
         message = ('ppi parsing finished for {}').format(org)
         utils.print_log(message)
 
     return organism.Organism(nodes_file=node_path,
                              edges_file=edge_path,
-                             org_id=org)
+                             org_id=org,
+                             network_file=network_path,
+                             threshold=threshold)
+
+
+# parse several organisms from the full ppi file, reading it only once
+def parse_organisms(orgs, ppi_file=cs.PPI_FILE,
+                    out_path=cs.JSON_PATH, check=True,
+                    threshold=cs.INTERACTION_THR):
+    # organisms without a usable parsed network
+    missing = []
+    for org in orgs:
+        cached = parsed_threshold(org, out_path) if check else None
+        if cached is None or cached > threshold:
+            missing.append(org)
+
+    if missing:
+        parse_organisms_ppi(missing, ppi_file, out_path)
+
+    return [parse_organism(org, out_path=out_path, threshold=threshold)
+            for org in orgs]
 
 
 # check if initial files are present
@@ -108,121 +361,105 @@ def check_initial_files(org, in_path=cs.STRING_PATH):
         '.protein.sequences.v10.5.fa',
     ]
 
-    file_names = [org + x for x in check_list]
+    file_paths = [utils.join_path(in_path, org + x) for x in check_list]
+
+    # the full links file of all organisms replaces the organism one
+    if utils.file_exists(input_file(cs.PPI_FILE), ''):
+        file_paths = file_paths[1:]
 
-    if utils.files_exist(file_names, in_path):
+    # gzip compressed inputs are read directly
+    if all([utils.file_exists(input_file(x), '') for x in file_paths]):
         message = ('initial files check passed for {}').format(org)
         utils.print_log(message)
 
     else:
-        err = ('the initial files for {} not found').format(org)
-        utils.print_log(err, mode='err')
+        # raised, not quit, so a pipeline running the check stops cleanly
+        missing = [x for x in file_paths
+                   if not utils.file_exists(input_file(x), '')]
+        raise FileNotFoundError(('the initial files for {} not found: {}'
+                                 ).format(org, missing))
 
 
 # extract single organism from full GO file
 def extract_organism_GO(org, go_file=cs.GO_FILE,
-                        out_path=cs.JSON_PATH):
-    out_file = utils.join_path(out_path, '{}-GO.json'.format(org))
+                        out_path=cs.JSON_PATH, workers=cs.PARSE_WORKERS):
+    out_file = utils.join_path(out_path, '{}-GO.store'.format(org))
 
-    if utils.file_exists(out_file, ''):
-        message = ('GO json already exists for {}').format(org)
+    if os.path.isdir(out_file):
+        message = ('GO store already exists for {}').format(org)
         utils.print_log(message)
 
-        return utils.load_json(out_file)
+        return annotation.AnnotationStore(out_file)
 
     else:
-        with open(go_file, 'r') as index:
-            # list of all gene annotations for all proteins
-            go_dict = {}
-
-            # start reading GO file
-            message = 'Extracting GO information for {}'.format(org)
-            utils.print_log(message)
-
-            line_count = 1
-            while True:
-                if line_count % cs.GO_REPORT_FREQ == 0:
-                    message = 'reached line #{}'.format(line_count)
-                    utils.print_log(message, mode='progress')
-                line_count += 1
-
-                line = index.readline()
-                if line == '':
-                    break
-                elif line.split('\t')[0] != org:
-                    continue
-                line = line.strip()
-                words = line.split('\t')
-                prot = words[0]
-                go = words[2]
-                evidence = words[5]
-                score = words[6]
-                # if int(score) > INTERACTION_THR:
-                go_dict[prot] = go_dict.get(prot, []) + [(go, evidence, score)]
-
-            message = 'Extracting GO for {} finished!'.format(org)
-            utils.print_log(message, mode='end_progress')
+        # start reading GO file
+        message = 'Extracting GO information for {}'.format(org)
+        utils.print_log(message)
 
-            utils.write_json(go_dict, out_file)
+        go_file = input_file(go_file)
+        if workers > 1 and not go_file.endswith('.gz'):
+            ranges = load_offset_index(go_file, go_line_org)['ranges']
+            records = parse_chunks(go_record, go_file, ranges.get(org, []),
+                                   workers)
+        else:
+            records = list(map(go_record,
+                               organism_lines(go_file, org, go_line_org)))
+
+        prots, gos, evidences, scores = zip(*records) if records else [()] * 4
+        go_store = annotation.AnnotationStore.build(
+            out_file, prots, gos, evidence=evidences, score=scores)
+
+        message = 'Extracting GO for {} finished! {} annotations'.format(
+            org, len(records))
+        utils.print_log(message)
 
-            return go_dict
+        return go_store
 
 
 # extract single organism from full GO file
-def extract_all_organism_GO(go_file, out_path=cs.JSON_PATH):
-    in_file = utils.join_path(cs.STRING_PATH, go_file)
-    out_file = utils.join_path(out_path, '{}-GO.json'.format(go_file))
+def extract_all_organism_GO(go_file, out_path=cs.JSON_PATH,
+                            workers=cs.PARSE_WORKERS):
+    in_file = input_file(utils.join_path(cs.STRING_PATH, go_file))
+    out_file = utils.join_path(out_path, '{}-GO.store'.format(go_file))
 
-    if utils.file_exists(out_file, ''):
-        message = ('GO json already exists for {}').format(go_file)
+    if os.path.isdir(out_file):
+        message = ('GO store already exists for {}').format(go_file)
         utils.print_log(message)
 
-        return utils.load_json(out_file)
+        return annotation.AnnotationStore(out_file)
 
     else:
-        with open(in_file, 'r') as index:
-            # list of all gene annotations for all proteins
-            go_dict = {}
-
-            # start reading GO file
-            message = 'Extracting GO information for {}'.format(go_file)
-            utils.print_log(message)
-
-            line_count = 1
-            while True:
-                if line_count % cs.GO_REPORT_FREQ == 0:
-                    message = 'reached line #{}'.format(line_count)
-                    utils.print_log(message, mode='progress')
-                line_count += 1
-                line = index.readline()
-
-                if line == '':
-                    break
-
-                line = line.strip()
-                words = line.split('\t')
-                org = words[0]
-                prot = words[1]
-                go = words[3]
-                evidence = words[6]
-                # score = words[7]
-                prot_id = '{}.{}'.format(org, prot)
-                # if int(score) > INTERACTION_THR:
-                if evidence in ['EXP', 'IDA', 'IMP', 'IGI', 'IEP', 'IPI']:
-                    go_dict[prot_id] = go_dict.get(prot_id, []) + [go]
+        # start reading GO file
+        message = 'Extracting GO information for {}'.format(go_file)
+        utils.print_log(message)
+
+        if workers > 1 and not in_file.endswith('.gz'):
+            file_size = os.path.getsize(in_file)
+            records = parse_chunks(all_go_record, in_file, [(0, file_size)],
+                                   workers)
+        else:
+            with utils.open_file(in_file, 'r') as index:
+                records = [x for x in map(all_go_record, index)
+                           if x is not None]
+
+        prot_ids, gos = zip(*records) if records else [(), ()]
+        go_store = annotation.AnnotationStore.build(out_file, prot_ids, gos,
+                                                    unique=True)
+
+        message = 'Extracting GO for {} finished! {} annotations'.format(
+            go_file, len(records))
+        utils.print_log(message)
 
-            message = 'Extracting GO for {} finished!'.format(go_file)
-            utils.print_log(message, mode='end_progress')
+        return go_store
 
-            utils.write_json(go_dict, out_file)
 
-            return go_dict
+# uniprot to string id mapping file of an organism
+def uniprot_map_file(org, in_path=cs.STRING_PATH):
+    return input_file(utils.join_path(in_path, '{}.uniprot.tsv'.format(org)))
 
 
 def get_uniprot_map(org, in_path=cs.STRING_PATH):
-    file_name = '{}.uniprot.tsv'.format(org)
-    with open(utils.join_path(cs.STRING_PATH,
-                              file_name), 'r') as mapping:
+    with utils.open_file(uniprot_map_file(org, in_path), 'r') as mapping:
 
         # uniprot to string id mapping dict
         uni2sdb = {}
@@ -3,10 +3,17 @@ this module contains general utility codes that are used in other modules
 """
 
 import os
+import io
+import gzip
+import hashlib
 import glob
+import shutil
 import subprocess
+import multiprocessing
+import multiprocessing.pool
 import shlex
 import time
+import threading
 import datetime
 import json
 import csv
@@ -69,6 +76,76 @@ def files_exist(file_names, path_name=cs.BASE_PATH):
     return all([file_exists(x, path_name) for x in file_names])
 
 
+# file exists and is not older than any existing source it was made from
+def up_to_date(file_path, *source_paths):
+    if not os.path.exists(file_path):
+        return False
+    return all([os.path.getmtime(file_path) >= os.path.getmtime(x)
+                for x in source_paths if os.path.exists(x)])
+
+
+# blake2b hex digest of the contents of several files
+def files_hash(*file_paths):
+    digest = hashlib.blake2b(digest_size=16)
+    for file_path in file_paths:
+        with open(file_path, 'rb') as infile:
+            for block in iter(lambda: infile.read(cs.READ_BUFFER_SIZE), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+# (size, modification time in ns) of several files
+def files_stats(*file_paths):
+    return np.array([(os.stat(x).st_size, os.stat(x).st_mtime_ns)
+                     for x in file_paths], dtype=np.int64)
+
+
+# open plain or gzip compressed files with a large read buffer
+def open_file(file_path, mode='r'):
+    if file_path.endswith('.gz'):
+        stream = io.BufferedReader(gzip.open(file_path, 'rb'),
+                                   buffer_size=cs.READ_BUFFER_SIZE)
+        if 'b' in mode:
+            return stream
+        return io.TextIOWrapper(stream)
+    return open(file_path, mode, buffering=cs.READ_BUFFER_SIZE)
+
+
+# split a byte range of a file into newline aligned chunks
+def file_chunks(file_path, start, end, chunk_size):
+    chunks = []
+    with open(file_path, 'rb') as infile:
+        while start < end:
+            stop = start + chunk_size
+            if stop < end:
+                infile.seek(stop)
+                infile.readline()
+                stop = infile.tell()
+            stop = min(stop, end)
+            chunks.append((start, stop))
+            start = stop
+    return chunks
+
+
+def read_chunk_lines(file_path, start, end):
+    with open(file_path, 'rb') as infile:
+        infile.seek(start)
+        return infile.read(end - start).decode().splitlines()
+
+
+# map over a process pool, results keep the order of the inputs
+def parallel_map(func, args, workers):
+    if workers <= 1:
+        return list(map(func, args))
+    with multiprocessing.Pool(workers) as pool:
+        return pool.map(func, args, chunksize=1)
+
+
+def read_bytes(file_path):
+    with open_file(file_path, 'rb') as infile:
+        return infile.read()
+
+
 def write_bytes(byte_obj, file_path):
     with open(file_path, 'wb') as outfile:
         outfile.write(byte_obj)
@@ -101,6 +178,40 @@ def load_np(file_path):
         return np.load(infile)
 
 
+def write_npz(file_path, **np_objs):
+    with open(file_path, 'wb') as outfile:
+        np.savez(outfile, **np_objs)
+
+
+def load_npz(file_path):
+    with np.load(file_path) as npz:
+        return {key: npz[key] for key in npz.files}
+
+
+# write a directory of .npy arrays, replaced as a whole once complete
+def write_arrays(dir_path, **np_objs):
+    tmp_path = dir_path + '.tmp'
+    if os.path.isdir(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+    for name, np_obj in np_objs.items():
+        write_np(np_obj, join_path(tmp_path, name + '.npy'))
+
+    if os.path.isdir(dir_path):
+        shutil.rmtree(dir_path)
+    os.rename(tmp_path, dir_path)
+
+
+# load a directory of .npy arrays, memory mapped unless mmap_mode is None
+def load_arrays(dir_path, mmap_mode='r'):
+    arrays = {}
+    for file_name in sorted(os.listdir(dir_path)):
+        if file_name.endswith('.npy'):
+            arrays[file_name[:-4]] = np.load(join_path(dir_path, file_name),
+                                             mmap_mode=mmap_mode)
+    return arrays
+
+
 def normalize(arr):
     return_val = (arr / sum(arr))
     return_val[np.isnan(return_val)] = 0
@@ -117,8 +228,9 @@ def time_str(mode='abs', base=None):
 
 
 def print_log(message, mode='info'):
+    # one write per line, pipeline steps log from several threads
     if mode == 'info':
-        print ('{}: [INFO] {}'.format(time_str(), message))
+        print ('{}: [INFO] {}\n'.format(time_str(), message), end='')
     if mode == 'err':
         print ('{}: [ERROR] {}'.format(time_str(), message))
         quit()
@@ -130,6 +242,15 @@ def print_log(message, mode='info'):
         print ('{}: [PROGRESS RESULT] {}'.format(time_str(), message))
 
 
+def print_throughput(name, line_count, byte_count, start_time):
+    duration = max(time_str('raw') - start_time, 1e-9)
+    message = ('{}: {} lines ({:.1f} MB) in {:.2f}s, '
+               '{:.0f} lines/s, {:.2f} MB/s').format(
+        name, line_count, byte_count / 2**20, duration,
+        line_count / duration, byte_count / 2**20 / duration)
+    print_log(message)
+
+
 # timer wrapper
 def time_it(func):
     @wraps(func)
@@ -151,12 +272,71 @@ def time_it(func):
 
 
 @time_it
-def run_cmd(cmd, input=None, cwd=give_cwd()):
+# run a command, with check a non zero exit code raises
+def run_cmd(cmd, input=None, cwd=give_cwd(), check=False):
     process = subprocess.Popen(shlex.split(cmd),
                                shell=False,
+                               stdin=(None if input is None
+                                      else subprocess.PIPE),
                                stdout=subprocess.PIPE,
                                cwd=cwd)
-    return process.communicate(input)
+    output = process.communicate(input)
+    if check:
+        check_returncode(cmd, process.returncode)
+    return output
+
+
+# failed commands must not pass for commands without output
+def check_returncode(cmd, returncode):
+    if returncode != 0:
+        raise Exception('command failed with exit code {}: {}'.format(
+            returncode, cmd))
+
+
+# yield the stdout lines of a command while it is still running
+def stream_cmd(cmd, input=None, cwd=give_cwd()):
+    process = subprocess.Popen(shlex.split(cmd),
+                               shell=False,
+                               stdin=(None if input is None
+                                      else subprocess.PIPE),
+                               stdout=subprocess.PIPE,
+                               cwd=cwd)
+
+    # input is written by another thread so a full stdout can not block it
+    if input is not None:
+        writer = threading.Thread(target=write_input,
+                                  args=(process.stdin, input))
+        writer.start()
+
+    for line in io.TextIOWrapper(process.stdout):
+        yield line
+    process.stdout.close()
+    check_returncode(cmd, process.wait())
+
+
+# write bytes to the stdin of a process and close it, a process that
+# stopped reading is reported by its return code instead
+def write_input(stdin, input):
+    try:
+        stdin.write(input)
+        stdin.close()
+    except BrokenPipeError:
+        pass
+
+
+# map over a thread pool, results keep the order of the inputs
+def thread_map(func, args, workers):
+    with multiprocessing.pool.ThreadPool(max(1, workers)) as pool:
+        return pool.map(func, args, chunksize=1)
+
+
+# run shell commands with at most workers of them at a time, inputs are
+# the stdin bytes of every command. a failed command raises
+def run_cmds(cmds, workers=1, cwd=give_cwd(), inputs=None):
+    if inputs is None:
+        inputs = [None] * len(cmds)
+    return thread_map(lambda x: run_cmd(x[0], x[1], cwd, check=True),
+                      list(zip(cmds, inputs)), workers)
 
 
 @time_it